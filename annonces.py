@@ -0,0 +1,472 @@
+"""Logique métier des annonces : instant d'expiration, ordre d'affichage et index d'expiration."""
+import bisect
+import heapq
+import html
+import itertools
+import re
+from datetime import date, time, timedelta
+
+# Liste des en-têtes de colonnes attendus dans votre Google Sheet (CRUCIAL)
+COLUMN_HEADERS = [
+    "type", "paroisse", "evenement_titre", "evenement_description",
+    "date_debut", "date_fin", "date_evenement", "heure_evenement",
+    "created_at", "recurrence"
+]
+
+# Une période reste active toute la journée de fin : "24:00" est postérieur à toute heure "HH:MM"
+END_OF_DAY = "24:00"
+
+# Type 'recurrent' : une seule ligne pour toute la série (première date dans date_debut, date
+# limite dans date_fin), règle dans la colonne recurrence, ex. "FREQ=WEEKLY;EXDATE=2026-12-25"
+RECURRENCE_FREQUENCIES = {"WEEKLY": "Chaque semaine", "MONTHLY": "Chaque mois"}
+
+
+def parse_recurrence(value):
+    """Analyse une règle "FREQ=WEEKLY|MONTHLY[;EXDATE=AAAA-MM-JJ,...]" -> (fréquence, dates exclues)."""
+    rule = {}
+    for part in str(value or "").split(";"):
+        key, _, part_value = part.partition("=")
+        if key.strip():
+            rule[key.strip().upper()] = part_value.strip()
+
+    frequency = rule.get("FREQ", "").upper()
+    if frequency not in RECURRENCE_FREQUENCIES:
+        raise ValueError(f"Récurrence invalide : '{value}'")
+    if rule.get("INTERVAL", "1") == "1":
+        rule.pop("INTERVAL", None)
+    # INTERVAL, COUNT, BYDAY... changeraient les dates : refusés plutôt qu'approchés
+    unsupported = sorted(set(rule) - {"FREQ", "EXDATE"})
+    if unsupported:
+        raise ValueError(
+            f"Récurrence non prise en charge : {', '.join(f'{key}={rule[key]}' for key in unsupported)} "
+            "(seules une fréquence hebdomadaire ou mensuelle, une date limite et des dates exclues sont acceptées)")
+    exdates = frozenset(
+        date.fromisoformat(day.strip()) for day in rule.get("EXDATE", "").split(",") if day.strip())
+    return frequency, exdates
+
+
+def format_recurrence(frequency, exdates=()):
+    """Règle de récurrence à stocker dans la colonne recurrence."""
+    rule = f"FREQ={frequency}"
+    if exdates:
+        rule += ";EXDATE=" + ",".join(sorted(day.isoformat() for day in exdates))
+    return rule
+
+
+def _add_months(day, months):
+    month = day.month - 1 + months
+    return day.year + month // 12, month % 12 + 1
+
+
+def occurrence_dates(debut, fin, frequency, exdates, date_min, date_max):
+    """
+    Dates de la série comprises dans [date_min, date_max], sans parcourir les occurrences antérieures :
+    le coût dépend de la fenêtre affichée, pas de la longueur de la série.
+    """
+    date_min, date_max = max(debut, date_min), min(fin, date_max)
+    if date_min > date_max:
+        return []
+
+    days = []
+    if frequency == "WEEKLY":
+        day = debut + timedelta(weeks=-(-(date_min - debut).days // 7))
+        while day <= date_max:
+            days.append(day)
+            day += timedelta(weeks=1)
+    else:
+        # Mensuel : même quantième chaque mois ; les mois trop courts sont sautés (comme RRULE)
+        months = (date_min.year - debut.year) * 12 + date_min.month - debut.month
+        while True:
+            year, month = _add_months(debut, months)
+            if date(year, month, 1) > date_max:
+                break
+            try:
+                day = date(year, month, debut.day)
+            except ValueError:
+                day = None
+            if day is not None and date_min <= day <= date_max:
+                days.append(day)
+            months += 1
+    return [day for day in days if day not in exdates]
+
+
+class Annonce:
+    """
+    Annonce typée et compacte (__slots__ générés depuis COLUMN_HEADERS).
+    Les dates et l'heure sont analysées une seule fois, à l'ingestion ; une annonce aux dates
+    invalides est signalée par `erreur` au lieu de lever une exception à chaque affichage.
+    """
+
+    # row : numéro de ligne dans la feuille (lecture paresseuse des colonnes non chargées)
+    # serie : pour une occurrence d'une série récurrente, l'annonce de la série
+    __slots__ = tuple(COLUMN_HEADERS) + ("debut", "fin", "heure", "erreur", "row", "serie")
+
+    def __init__(self, values, row=None):
+        for header in COLUMN_HEADERS:
+            setattr(self, header, values.get(header))
+        self.row = row
+        self.serie = None
+        self._parse()
+
+    @classmethod
+    def from_columns(cls, columns, first_row=None):
+        """
+        Construit les annonces à partir de colonnes {en-tête: [valeurs]} (lecture projetée),
+        sans passer par un dict par ligne. Les colonnes absentes valent None (non chargées).
+        """
+        length = max((len(values) for values in columns.values()), default=0)
+        missing = [header for header in COLUMN_HEADERS if header not in columns]
+        annonces = []
+        for i in range(length):
+            annonce = cls.__new__(cls)
+            for header, values in columns.items():
+                setattr(annonce, header, values[i] if i < len(values) else "")
+            for header in missing:
+                setattr(annonce, header, None)
+            annonce.row = None if first_row is None else first_row + i
+            annonce.serie = None
+            annonce._parse()
+            annonces.append(annonce)
+        return annonces
+
+    def _parse(self):
+        self.debut = self.fin = self.heure = self.erreur = None
+        annonce_type = self.get('type', 'ponctuel')
+
+        try:
+            if annonce_type in ('periode', 'recurrent'):
+                self.debut = date.fromisoformat(self.date_debut)
+                self.fin = date.fromisoformat(self.date_fin)
+                if self.debut > self.fin:
+                    self.erreur = "Date de fin antérieure à la date de début"
+            elif annonce_type == 'ponctuel':
+                self.debut = self.fin = date.fromisoformat(self.date_evenement)
+        except (TypeError, ValueError):
+            self.debut = self.fin = None
+            self.erreur = f"Date(s) invalide(s) (Type: {annonce_type})"
+
+        if annonce_type == 'recurrent' and not self.erreur:
+            try:
+                parse_recurrence(self.recurrence)
+            except ValueError as e:
+                self.erreur = str(e)
+
+        try:
+            self.heure = time.fromisoformat(str(self.heure_evenement))
+        except ValueError:
+            self.heure = None
+
+    def occurrences(self, date_min, date_max):
+        """
+        Occurrences d'une série récurrente comprises dans [date_min, date_max], sous forme
+        d'annonces 'ponctuel' générées à la demande (jamais stockées).
+        """
+        if self.get('type') != 'recurrent' or self.erreur:
+            return []
+        frequency, exdates = parse_recurrence(self.recurrence)
+        occurrences = []
+        for day in occurrence_dates(self.debut, self.fin, frequency, exdates, date_min, date_max):
+            occurrence = Annonce.__new__(Annonce)
+            for header in COLUMN_HEADERS:
+                setattr(occurrence, header, getattr(self, header))
+            occurrence.type = 'ponctuel'
+            occurrence.date_evenement = day.isoformat()
+            occurrence.debut = occurrence.fin = day
+            occurrence.heure, occurrence.erreur, occurrence.row = self.heure, None, self.row
+            occurrence.serie = self
+            occurrences.append(occurrence)
+        return occurrences
+
+    def get(self, key, default=None):
+        """Accès compatible dict aux colonnes (default si la valeur est absente)."""
+        value = getattr(self, key, None) if key in COLUMN_HEADERS else None
+        return default if value is None else value
+
+    def __getitem__(self, key):
+        if key not in COLUMN_HEADERS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __eq__(self, other):
+        if not isinstance(other, Annonce):
+            return NotImplemented
+        return all(getattr(self, header) == getattr(other, header) for header in COLUMN_HEADERS)
+
+    def to_dict(self):
+        return {header: getattr(self, header) for header in COLUMN_HEADERS if getattr(self, header) is not None}
+
+    def __repr__(self):
+        return f"Annonce({self.to_dict()!r})"
+
+
+def expiry_key(annonce):
+    """
+    Instant d'expiration (date ISO, heure "HH:MM") de l'annonce, comparable à (aujourd'hui, maintenant).
+    Retourne None pour les types qui n'expirent pas.
+    """
+    annonce_type = annonce.get('type', 'ponctuel')
+
+    if annonce_type in ('periode', 'recurrent'):
+        # Une série expire après sa date limite
+        return str(annonce.get('date_fin') or ""), END_OF_DAY
+
+    if annonce_type == 'ponctuel':
+        date_evt = annonce.get('date_evenement')
+        if not date_evt:
+            return "", ""
+        return str(date_evt), str(annonce.get('heure_evenement', '00:00'))
+
+    return None
+
+
+def start_key(annonce):
+    """Clé de tri d'affichage : date de début pour une période, date de l'événement sinon."""
+    if annonce.get('type') in ('periode', 'recurrent'):
+        return str(annonce.get('date_debut', date.today().isoformat()))
+    return str(annonce.get('date_evenement', date.today().isoformat()))
+
+
+class ExpiryIndex:
+    """
+    Annonces rangées par instant d'expiration (tas) et par date de début (liste triée).
+    Le retrait des annonces expirées dépile le début du tas : son coût dépend du nombre
+    d'annonces nouvellement expirées, pas de l'historique total.
+    """
+
+    def __init__(self, annonces=()):
+        self._seq = itertools.count()
+        self._heap = []
+        self._start_keys = []
+        self._active = []
+        self.extend(annonces)
+
+    def __len__(self):
+        return len(self._active)
+
+    def add(self, annonce):
+        """Insère une annonce à sa place (ordre de début stable : à date égale, ordre d'ajout)."""
+        seq = next(self._seq)
+        start = (start_key(annonce), seq)
+        position = bisect.bisect_right(self._start_keys, start)
+        self._start_keys.insert(position, start)
+        self._active.insert(position, annonce)
+
+        expiry = expiry_key(annonce)
+        if expiry is not None:
+            heapq.heappush(self._heap, (expiry, seq, start, annonce))
+
+    def extend(self, annonces):
+        """Ajoute plusieurs annonces ; reconstruit les structures en une passe si le lot est gros."""
+        annonces = list(annonces)
+        if len(annonces) < 64:
+            for annonce in annonces:
+                self.add(annonce)
+            return
+
+        entries = list(zip(self._start_keys, self._active))
+        for annonce in annonces:
+            seq = next(self._seq)
+            start = (start_key(annonce), seq)
+            entries.append((start, annonce))
+            expiry = expiry_key(annonce)
+            if expiry is not None:
+                self._heap.append((expiry, seq, start, annonce))
+
+        entries.sort(key=lambda entry: entry[0])
+        self._start_keys = [start for start, _ in entries]
+        self._active = [annonce for _, annonce in entries]
+        heapq.heapify(self._heap)
+
+    def _remove_start(self, start):
+        position = bisect.bisect_left(self._start_keys, start)
+        del self._start_keys[position]
+        del self._active[position]
+
+    def pop_expired(self, now):
+        """Retire et retourne les annonces dont l'instant d'expiration est antérieur à now = (date ISO, "HH:MM")."""
+        expired = []
+        while self._heap and self._heap[0][0] < now:
+            _, _, start, annonce = heapq.heappop(self._heap)
+            expired.append((start, annonce))
+
+        if len(expired) <= 32:
+            for start, _ in expired:
+                self._remove_start(start)
+        else:
+            # Beaucoup d'expirations d'un coup (premier chargement...) : un seul filtrage linéaire
+            expired_seqs = {start[1] for start, _ in expired}
+            kept = [i for i, start in enumerate(self._start_keys) if start[1] not in expired_seqs]
+            self._start_keys = [self._start_keys[i] for i in kept]
+            self._active = [self._active[i] for i in kept]
+        return [annonce for _, annonce in expired]
+
+    def active(self):
+        """Copie de la liste des annonces, triée par date de début."""
+        return list(self._active)
+
+    def overlapping(self, date_min=None, date_max=None):
+        """Annonces qui chevauchent [date_min, date_max] (dates) ; seules celles commençant avant date_max sont lues."""
+        end = len(self._active)
+        if date_max is not None:
+            end = bisect.bisect_right(self._start_keys, (date_max.isoformat(), float("inf")))
+        return [
+            annonce for annonce in itertools.islice(self._active, end)
+            if annonce.fin is not None and (date_min is None or annonce.fin >= date_min)
+        ]
+
+
+def expand_recurrences(annonces, date_min, date_max, now=None):
+    """
+    Remplace chaque série récurrente (liste triée par date de début) par ses occurrences de
+    [date_min, date_max] ; now = (date ISO, "HH:MM") écarte les occurrences déjà passées, comme
+    les annonces ponctuelles expirées. Le résultat reste trié par date de début.
+    """
+    singles, occurrences = [], []
+    for annonce in annonces:
+        if annonce.get('type') == 'recurrent' and not annonce.erreur:
+            occurrences.extend(
+                occurrence for occurrence in annonce.occurrences(date_min, date_max)
+                if now is None or expiry_key(occurrence) >= now)
+        else:
+            singles.append(annonce)
+    if not occurrences:
+        return singles
+    occurrences.sort(key=start_key)
+    return list(heapq.merge(singles, occurrences, key=start_key))
+
+
+# --- Statut des rappels (calcul vectorisé) ---
+
+STATUS_COLORS = {
+    "invalide": 'gray',
+    "indetermine": 'gray',
+    "dernier_jour": 'red',
+    "fin_proche": 'red',
+    "en_cours": 'green',
+    "aujourdhui": 'red',
+    "demain": 'red',
+    "bientot": 'orange',
+    "prevu": 'blue',
+}
+
+
+def status_table(annonces, today=None):
+    """
+    Calcule en une passe vectorisée (pandas) le statut de chaque annonce active :
+    jours avant le début, jours restants, catégorie, couleur, texte et légende prêts à afficher.
+    """
+    # Import différé : pandas n'est chargé qu'au premier affichage des rappels
+    import numpy as np
+    import pandas as pd
+
+    today = pd.Timestamp(today or date.today())
+    df = pd.DataFrame({
+        "annonce": pd.Series(list(annonces), dtype=object),
+        "type": [a.get('type', 'ponctuel') for a in annonces],
+        "paroisse": [a.get('paroisse', 'Paroisse Inconnue') for a in annonces],
+        "titre": [a.get('evenement_titre', 'Titre manquant') for a in annonces],
+        "description": [a.get('evenement_description', 'Pas de description') for a in annonces],
+        # Heure reformatée depuis la valeur analysée : la cellule brute n'entre jamais dans le Markdown
+        "heure": [a.heure.strftime('%H:%M') if a.heure else 'Non spécifiée' for a in annonces],
+        "erreur": pd.Series([a.erreur for a in annonces], dtype=object),
+        "debut": pd.to_datetime([a.debut for a in annonces]),
+        "fin": pd.to_datetime([a.fin for a in annonces]),
+    }, columns=["annonce", "type", "paroisse", "titre", "description", "heure", "erreur", "debut", "fin"])
+
+    df["days_to_start"] = (df["debut"] - today).dt.days.astype("Int64")
+    df["days_remaining"] = (df["fin"] - today).dt.days.astype("Int64")
+
+    invalide = df["erreur"].notna()
+    periode = ~invalide & (df["type"] == 'periode')
+    ponctuel = ~invalide & (df["type"] == 'ponctuel')
+    en_cours = periode & (df["days_to_start"] <= 0) & (df["days_remaining"] >= 0)
+    a_venir = periode & (df["days_to_start"] > 0)
+    to_start = df["days_to_start"]
+
+    conditions = [
+        invalide,
+        en_cours & (df["days_remaining"] == 0),
+        en_cours & (df["days_remaining"] <= 3),
+        en_cours,
+        a_venir & (to_start == 1),
+        a_venir & (to_start <= 7),
+        a_venir,
+        ponctuel & (to_start == 0),
+        ponctuel & (to_start == 1),
+        ponctuel & (to_start <= 7),
+        ponctuel,
+    ]
+    conditions = [condition.fillna(False).to_numpy(dtype=bool) for condition in conditions]
+    categories = ["invalide", "dernier_jour", "fin_proche", "en_cours", "demain", "bientot", "prevu",
+                  "aujourdhui", "demain", "bientot", "prevu"]
+    df["status"] = np.select(conditions, categories, default="indetermine")
+    df["color"] = df["status"].map(STATUS_COLORS)
+
+    heure = df["heure"].astype(str)
+    days_to_start = to_start.astype(str)
+    days_remaining = df["days_remaining"].astype(str)
+    debut_fr = df["debut"].dt.strftime('%d/%m/%Y')
+    fin_fr = df["fin"].dt.strftime('%d/%m/%Y')
+    # Même type chaîne que les colonnes formatées ci-dessus : la concaténation fonctionne aussi sans annonce
+    recurrence = pd.Series([recurrence_label(a) for a in annonces], index=df.index, dtype=str)
+
+    texts = [
+        df["erreur"],
+        "🔥 **DERNIER JOUR AUJOURD'HUI !** (jusqu'à " + heure + ")",
+        "🚨 **EN COURS :** Termine dans " + days_remaining + " jour(s)",
+        "▶️ **EN COURS** (Termine le " + fin_fr + ")",
+        pd.Series("🚨 **DEMAIN :** Commence !", index=df.index),
+        "⚠️ Bientôt : Commence dans " + days_to_start + " jours",
+        "📅 Prévu : Commence dans " + days_to_start + " jours",
+        "🔥 **AUJOURD'HUI !** à **" + heure + "**",
+        "🚨 **DEMAIN !** à **" + heure + "**",
+        "⚠️ Bientôt : Dans " + days_to_start + " jours",
+        "📅 Prévu : Dans " + days_to_start + " jours",
+    ]
+    df["status_text"] = np.select(
+        conditions, [text.to_numpy(dtype=object) for text in texts], default="Statut indéterminé")
+
+    df["caption"] = np.select(
+        [conditions[0], periode.to_numpy(dtype=bool), ponctuel.to_numpy(dtype=bool)],
+        [
+            "Erreur de données",
+            ("Période : Du **" + debut_fr + "** au **" + fin_fr + "** à partir de **" + heure + "**").to_numpy(dtype=object),
+            ("Date : **" + debut_fr + "** à **" + heure + "**" + recurrence).to_numpy(dtype=object),
+        ],
+        default="",
+    )
+    return df
+
+
+def recurrence_label(annonce):
+    """Mention affichée sous une occurrence de série récurrente (vide pour les autres annonces)."""
+    if annonce.serie is None:
+        return ""
+    frequency, _ = parse_recurrence(annonce.serie.recurrence)
+    return f" · 🔁 {RECURRENCE_FREQUENCIES[frequency]} jusqu'au {annonce.serie.fin.strftime('%d/%m/%Y')}"
+
+
+_MARKDOWN_SPECIAL = re.compile(r"([\\`*_{}\[\]()#+\-.!|~$:])")
+
+
+def escape_markdown(text):
+    """
+    Texte saisi (ou importé) affiché tel quel dans du Markdown avec HTML autorisé : balises
+    échappées, syntaxe Markdown neutralisée, retours à la ligne conservés.
+    """
+    text = _MARKDOWN_SPECIAL.sub(r"\\\1", str(text))
+    return html.escape(text).replace("\r\n", "\n").replace("\n", "  \n")
+
+
+def reminder_card_markdown(row):
+    """Markdown d'une carte de rappel (une ligne de status_table) ; seul le statut contient du HTML."""
+    # Le message d'erreur d'une annonce invalide peut citer la cellule saisie (règle de récurrence...)
+    status_text = escape_markdown(row.status_text) if row.status == "invalide" else row.status_text
+    return (
+        f"**Paroisse :** {escape_markdown(row.paroisse)}  \n"
+        f"**Titre :** {escape_markdown(row.titre)}  \n"
+        f"**Description :** {escape_markdown(row.description)}  \n"
+        f":gray[{row.caption}]\n\n"
+        f'<div style="font-size: 1.0em; padding-top: 5px; font-weight: bold; color: {row.color};"> {status_text}</div>\n\n'
+        "---"
+    )
@@ -1,10 +1,19 @@
 import streamlit as st
-from datetime import date, time, datetime
+from datetime import date, time, datetime, timedelta
+import functools
 import json
 import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
 # import hashlib # SUPPRIMÉ
-import gspread  # NOUVEL IMPORT
-import pandas as pd  # NOUVEL IMPORT
+# gspread et pandas sont importés à la demande : le premier affichage ne les attend pas
+
+import metrics
+from annonces import (COLUMN_HEADERS, RECURRENCE_FREQUENCIES, escape_markdown, expand_recurrences,
+                      format_recurrence, reminder_card_markdown, status_table)
+from search import slugify
+from storage import AnnonceCache, SheetStore, SQLiteStore
+from writer import AnnonceWriter
 
 # --- Configuration et Initialisation ---
 
@@ -13,21 +22,66 @@ st.set_page_config(
     layout="wide"
 )
 
-# --- CONFIGURATION GOOGLE SHEETS (utilisant st.secrets) ---
-# Liste des en-têtes de colonnes attendus dans votre Google Sheet (CRUCIAL)
-COLUMN_HEADERS = [
-    "type", "paroisse", "evenement_titre", "evenement_description",
-    "date_debut", "date_fin", "date_evenement", "heure_evenement",
-    "created_at"
-]
-
+# Mesures de performance du rerun courant (affichées dans le panneau admin)
+rerun_metrics = metrics.begin_rerun()
+
+# --- CONFIGURATION DU STOCKAGE (utilisant st.secrets) ---
+# Backend "sheets" (Google Sheets, par défaut) ou "sqlite" (fichier local, sans réseau)
+STORAGE_CONFIG = st.secrets.get("storage", {})
+STORAGE_BACKEND = STORAGE_CONFIG.get("backend", "sheets")
+# Délai maximal d'une requête Google Sheets (sans délai, une requête bloquée fige la synchronisation)
+REQUEST_TIMEOUT_SECONDS = STORAGE_CONFIG.get("request_timeout", 30)
+
+# Instrumentation : [metrics] admin_panel = true, log_path = "metrics.jsonl", history = 200
+METRICS_CONFIG = st.secrets.get("metrics", {})
+
+
+@st.cache_resource
+def get_metrics_recorder():
+    """Historique des mesures des derniers reruns, partagé par le processus."""
+    return metrics.MetricsRecorder(
+        history=METRICS_CONFIG.get("history", 200),
+        log_path=METRICS_CONFIG.get("log_path"),
+    )
+
+
+# --- CONFIGURATION DES SOURCES (utilisant st.secrets) ---
+# Une source par diocèse / communauté, chacune avec son cache et sa file d'écriture :
+#   [[storage.sources]]
+#   name = "Diocèse A"
+#   sheet_name = "Annonces Diocèse A"   # backend "sheets" ; worksheet = "annonce" par défaut
+#   sqlite_path = "diocese_a.db"        # backend "sqlite"
+# Sans [[storage.sources]] : une seule source ([google_sheets] sheet_name, ou [storage] sqlite_path).
+SOURCES = {}
 try:
-    SHEET_NAME = st.secrets["google_sheets"]["sheet_name"]
-except KeyError:
+    for source_config in STORAGE_CONFIG.get("sources", []):
+        if STORAGE_BACKEND == "sqlite":
+            source = {"sqlite_path": source_config["sqlite_path"]}
+        else:
+            source = {"sheet_name": source_config["sheet_name"],
+                      "worksheet": source_config.get("worksheet", "annonce")}
+        SOURCES[source_config.get("name") or next(iter(source.values()))] = source
+    if not SOURCES:
+        if STORAGE_BACKEND == "sqlite":
+            SOURCES["local"] = {"sqlite_path": STORAGE_CONFIG.get("sqlite_path", "annonces.db")}
+        else:
+            sheet_name = st.secrets["google_sheets"]["sheet_name"]
+            SOURCES[sheet_name] = {"sheet_name": sheet_name, "worksheet": "annonce"}
+except KeyError as e:
     st.error(
-        "Erreur de configuration: La clé 'sheet_name' est manquante. Vérifiez votre fichier .streamlit/secrets.toml.")
+        f"Erreur de configuration: La clé {e} est manquante. Vérifiez votre fichier .streamlit/secrets.toml.")
     st.stop()
 
+DEFAULT_SOURCE = next(iter(SOURCES))
+# Sources chargées en parallèle : le temps de chargement est celui de la source la plus lente
+LOAD_WORKERS = STORAGE_CONFIG.get("load_workers", min(len(SOURCES), 8))
+
+
+def current_source():
+    """Source choisie dans l'en-tête (la première par défaut)."""
+    name = st.session_state.get("source")
+    return name if name in SOURCES else DEFAULT_SOURCE
+
 
 HARDCODED_USERNAME = "Groupe Emmanuel"
 HARDCODED_PASSWORD = "RCC2025" 
@@ -36,13 +90,24 @@ HARDCODED_PASSWORD = "RCC2025"
 
 @st.cache_resource(ttl=3600)  # Mise en cache de la connexion pour 1h
 def get_gspread_client():
-    """Initialise et retourne le client gspread en utilisant les secrets Streamlit."""
+    """
+    Initialise et retourne le client gspread en utilisant les secrets Streamlit.
+    Un seul client (une seule session HTTP) est partagé par toutes les sources.
+    """
+    metrics.count("cache_miss.get_gspread_client")
+    import gspread
+    from requests.adapters import HTTPAdapter
+
     try:
         secrets = st.secrets["gcp_service_account"]
         # Assure que la clé privée est correctement formatée pour gspread (gestion des \n)
         gcp_credentials = {k: v.replace('\\n', '\n') if k == 'private_key' else v for k, v in secrets.items()}
 
         gc = gspread.service_account_from_dict(gcp_credentials)
+        # Pool de connexions dimensionné pour les chargements parallèles (10 par défaut dans requests)
+        pool_size = max(10, LOAD_WORKERS * 2)
+        gc.http_client.session.mount("https://", HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size))
+        gc.http_client.set_timeout(REQUEST_TIMEOUT_SECONDS)
         return gc
     except KeyError:
         st.error(
@@ -53,43 +118,155 @@ def get_gspread_client():
         return None
 
 
-gc = get_gspread_client()
-
-
 @st.cache_resource(ttl=300)  # Mise en cache de la feuille pour 5 min
-def get_worksheet():
+def get_worksheet(sheet_name, worksheet_title="annonce"):
+    # Client créé au premier besoin (et non à l'import) : la page de connexion s'affiche sans attendre Google
+    with metrics.stage("get_gspread_client"):
+        gc = get_gspread_client()
     if not gc:
         return None
+    metrics.count("cache_miss.get_worksheet")
+    # gc.open + sh.worksheet : deux appels à l'API Google
+    metrics.count("api_calls", 2)
     try:
-        sh = gc.open(SHEET_NAME)
-        worksheet = sh.worksheet("annonce") # Ouvre la première feuille de calcul
+        sh = gc.open(sheet_name)
+        worksheet = sh.worksheet(worksheet_title)
         return worksheet
     except Exception as e:
         st.error(
-            f"Erreur lors de l'ouverture de la Google Sheet '{SHEET_NAME}'. Avez-vous partagé la feuille avec l'email du compte de service? Détail: {e}")
+            f"Erreur lors de l'ouverture de la Google Sheet '{sheet_name}'. Avez-vous partagé la feuille avec l'email du compte de service? Détail: {e}")
         return None
 
 
-# --- FONCTION DE CHARGEMENT (Remplacement de load_annonces JSON) ---
+@st.cache_resource
+def get_sqlite_store(path):
+    """Ouvre (une seule fois par processus) la base SQLite locale."""
+    return SQLiteStore(path)
+
+
+def get_store(source_name=None):
+    """Retourne le stockage de la source (source courante par défaut), ou None si indisponible."""
+    source = SOURCES[source_name or current_source()]
+    if STORAGE_BACKEND == "sqlite":
+        try:
+            return get_sqlite_store(source["sqlite_path"])
+        except sqlite3.Error as e:
+            st.error(f"Erreur lors de l'ouverture de la base '{source['sqlite_path']}'. Détail: {e}")
+            return None
 
-def load_annonces():
-    """Charge la liste des annonces depuis Google Sheets."""
-    ws = get_worksheet()
+    with metrics.stage("get_worksheet"):
+        ws = get_worksheet(source["sheet_name"], source["worksheet"])
     if not ws:
-        return []
+        return None
+    # Chaque appel de méthode de la feuille est un appel à l'API Google
+    return SheetStore(metrics.CountingProxy(ws))
+
+
+# Le cache entier est reconstruit (rechargement complet) après cache_ttl secondes
+@st.cache_resource(ttl=STORAGE_CONFIG.get("cache_ttl", 3600))
+def _get_source_cache(source_name):
+    return AnnonceCache(refresh_interval=STORAGE_CONFIG.get("refresh_interval", 60))
+
+
+def get_annonce_cache(source_name=None):
+    """Cache des annonces d'une source, unique pour le processus, partagé par toutes les sessions."""
+    return _get_source_cache(source_name or current_source())
+
+
+@st.cache_resource
+def _get_source_writer(source_name):
+    journal_path = STORAGE_CONFIG.get("journal_path", "annonces_journal.jsonl")
+    if source_name != DEFAULT_SOURCE:
+        # Un journal par source : les annonces rejouées au redémarrage retournent dans la bonne feuille
+        root, ext = os.path.splitext(journal_path)
+        journal_path = f"{root}-{slugify(source_name)}{ext}"
+    return AnnonceWriter(
+        # Appelé depuis le thread d'écriture, sans session : la source est fixée ici
+        lambda: get_store(source_name),
+        journal_path=journal_path,
+        batch_size=STORAGE_CONFIG.get("write_batch_size", 50),
+        min_interval=STORAGE_CONFIG.get("write_interval", 1.0),
+    ).start()
+
+
+def get_annonce_writer(source_name=None):
+    """File d'écriture en arrière-plan (journal local + ajouts groupés) d'une source, unique pour le processus."""
+    return _get_source_writer(source_name or current_source())
+
+
+@st.cache_resource
+def get_loader_pool():
+    """Threads de chargement partagés par toutes les sources et toutes les sessions."""
+    return ThreadPoolExecutor(max_workers=max(1, LOAD_WORKERS), thread_name_prefix="annonce-loader")
+
+
+# --- FONCTION DE CHARGEMENT (Remplacement de load_annonces JSON) ---
+
+def _sync_annonce_cache(cache, store):
+    """Synchronise le cache partagé avec le stockage puis oublie les annonces terminées."""
+    today = date.today().isoformat()
+    # Premier chargement SQLite limité aux annonces non terminées (index date_fin / date_evenement)
+    cache.refresh(store, full=not STORAGE_CONFIG.get("incremental_sync", True), date_min=today)
+    cache.discard_before(today)
+
+
+def start_loading_annonces():
+    """
+    Lance en parallèle la synchronisation des caches de toutes les sources qui en ont besoin
+    (n'attend pas). Une source en échec garde son erreur (last_error) sans bloquer les autres.
+    """
+    recorder = get_metrics_recorder()
+    for source_name in SOURCES:
+        cache = get_annonce_cache(source_name)
+        if cache.is_stale():
+            cache.refresh_in_background(
+                lambda source_name=source_name: get_store(source_name),
+                lambda store, cache=cache: _sync_annonce_cache(cache, store),
+                executor=get_loader_pool(),
+                # Hors de tout rerun : appels API et étapes mesurés comme une entrée "sync:<source>"
+                context=lambda source_name=source_name: metrics.recording(recorder, f"sync:{source_name}"))
+
+
+def load_annonces(force=False):
+    """
+    Synchronise le cache partagé avec le stockage (au plus une fois par refresh_interval,
+    sauf si force=True) et retourne les annonces en cache.
+    """
+    cache = get_annonce_cache()
+    if cache.is_refreshing():
+        # Synchronisation déjà en cours en arrière-plan : on sert le cache tel quel plutôt que de
+        # l'attendre à chaque rerun. Une synchronisation forcée l'attend, au plus LOAD_TIMEOUT_SECONDS.
+        if not force:
+            metrics.count("cache_hit.annonces")
+            return cache.records
+        with metrics.stage("load_annonces"):
+            cache.wait_background_refresh(LOAD_TIMEOUT_SECONDS)
+        if cache.is_refreshing():
+            # Toujours en cours : la prochaine exécution resynchronisera
+            cache.mark_stale()
+            return cache.records
+
+    if not force and not cache.is_stale():
+        metrics.count("cache_hit.annonces")
+        return cache.records
+
+    metrics.count("cache_miss.annonces")
+    store = get_store()
+    if not store:
+        return cache.records
 
     try:
-        list_of_dicts = ws.get_all_records(head=1, empty2zero=False)
-        return list_of_dicts
+        with metrics.stage("load_annonces"):
+            _sync_annonce_cache(cache, store)
 
     except Exception as e:
         st.error(f"Erreur lors de la lecture des annonces depuis Google Sheets. Détail: {e}")
-        return []
+
+    return cache.records
 
 
-# Initialisation de la session state
-if 'annonces' not in st.session_state:
-    st.session_state.annonces = load_annonces()
+# Synchronisation du cache partagé en arrière-plan : l'interface s'affiche sans l'attendre
+start_loading_annonces()
 
 if 'logged_in' not in st.session_state:
     st.session_state.logged_in = False
@@ -98,27 +275,58 @@ if 'logged_in' not in st.session_state:
 # --- Fonctions de Traitement (Mise à jour pour l'écriture GSpread) ---
 
 def _add_annonce_to_list(new_annonce, paroisse, evenement_titre):
-    """Fonction interne pour ajouter une annonce en session et dans Google Sheets (APPEND)."""
-
-    # 1. Mise à jour de la session state
-    st.session_state.annonces.append(new_annonce)
+    """
+    Fonction interne pour ajouter une annonce au cache partagé et dans Google Sheets (APPEND).
+    Retourne False si l'annonce est un doublon (rien n'est écrit).
+    """
 
-    # 2. Sauvegarde dans Google Sheets (APPEND NOUVELLE LIGNE)
-    ws = get_worksheet()
-    if not ws:
+    # 1. Mise à jour du cache partagé (visible immédiatement par toutes les sessions), sauf doublon :
+    # index (paroisse, titre, date, heure) consulté en O(1) sur le cache tel quel, sans lecture réseau.
+    # Un doublon ajouté ailleurs depuis la dernière synchronisation reste possible.
+    duplicate = get_annonce_cache().add_unique(new_annonce)
+    if duplicate is not None:
+        st.warning(
+            f"L'événement **'{evenement_titre}'** pour **'{paroisse}'** existe déjà à cette date et à cette heure "
+            f"(enregistré le {duplicate.get('created_at', '?')}). Il n'a pas été enregistré une seconde fois.")
+        return False
+
+    # 2. Sauvegarde dans le stockage (APPEND NOUVELLE LIGNE)
+    if STORAGE_CONFIG.get("write_queue", True):
+        # Journal local puis écriture groupée en arrière-plan : le formulaire n'attend pas le réseau
+        try:
+            get_annonce_writer().submit(new_annonce)
+        except OSError as e:
+            st.error(f"Erreur critique lors de la journalisation de l'annonce: {e}")
+        return True
+
+    store = get_store()
+    if not store:
         st.warning(
             "Annonce ajoutée localement, mais la connexion à Google Sheets a échoué. Elle sera perdue si vous quittez l'application.")
-        return
+        return True
 
     try:
-        # Construit une liste de valeurs dans l'ordre des entêtes
-        row_data = [new_annonce.get(header, "") for header in COLUMN_HEADERS]
-
-        # Ajout de la ligne à la feuille
-        ws.append_row(row_data, value_input_option='USER_ENTERED')
+        store.append(new_annonce)
 
     except Exception as e:
         st.error(f"Erreur critique lors de l'ajout de l'annonce dans Google Sheets: {e}")
+    return True
+
+
+def _rerun_with_success(form_key, message):
+    """
+    Relance toute l'application après un enregistrement réussi : l'onglet Rappels (fragment à part)
+    et le compteur d'écritures en attente l'affichent aussitôt. Le message survit à la relance.
+    """
+    st.session_state[f"success_{form_key}"] = message
+    st.rerun(scope="app")
+
+
+def show_pending_success(form_key):
+    """Affiche le message laissé par _rerun_with_success pour ce formulaire."""
+    message = st.session_state.pop(f"success_{form_key}", None)
+    if message:
+        st.success(message)
 
 
 def add_annonce_periode(paroisse, evenement_titre, evenement_description, date_debut, date_fin, heure_evenement):
@@ -133,9 +341,9 @@ def add_annonce_periode(paroisse, evenement_titre, evenement_description, date_d
         "heure_evenement": heure_evenement,
         "created_at": date.today().isoformat()
     }
-    _add_annonce_to_list(new_annonce, paroisse, evenement_titre)
-    st.success(
-        f"Événement période **'{evenement_titre}'** pour **'{paroisse}'** enregistré du {date_debut} au {date_fin}.")
+    if _add_annonce_to_list(new_annonce, paroisse, evenement_titre):
+        _rerun_with_success(
+            "periode", f"Événement période **'{evenement_titre}'** pour **'{paroisse}'** enregistré du {date_debut} au {date_fin}.")
 
 
 def add_annonce_ponctuel(paroisse, evenement_titre, evenement_description, date_evenement, heure_evenement):
@@ -149,54 +357,121 @@ def add_annonce_ponctuel(paroisse, evenement_titre, evenement_description, date_
         "heure_evenement": heure_evenement,
         "created_at": date.today().isoformat()
     }
-    _add_annonce_to_list(new_annonce, paroisse, evenement_titre)
-    st.success(
-        f"Événement ponctuel **'{evenement_titre}'** pour **'{paroisse}'** enregistré pour le {date_evenement} à {heure_evenement}.")
+    if _add_annonce_to_list(new_annonce, paroisse, evenement_titre):
+        _rerun_with_success(
+            "ponctuel", f"Événement ponctuel **'{evenement_titre}'** pour **'{paroisse}'** enregistré pour le {date_evenement} à {heure_evenement}.")
+
+
+def add_annonce_recurrent(paroisse, evenement_titre, evenement_description, date_debut, date_fin, heure_evenement,
+                          recurrence):
+    """Ajoute une série 'recurrent' : une seule ligne, les occurrences sont calculées à l'affichage."""
+    new_annonce = {
+        "type": "recurrent",
+        "paroisse": paroisse,
+        "evenement_titre": evenement_titre,
+        "evenement_description": evenement_description,
+        "date_debut": date_debut,
+        "date_fin": date_fin,
+        "heure_evenement": heure_evenement,
+        "created_at": date.today().isoformat(),
+        "recurrence": recurrence,
+    }
+    if _add_annonce_to_list(new_annonce, paroisse, evenement_titre):
+        _rerun_with_success(
+            "recurrent", f"Événement récurrent **'{evenement_titre}'** pour **'{paroisse}'** enregistré du {date_debut} au {date_fin} à {heure_evenement}.")
 
 
-def filter_and_cleanup_annonces():
+def import_annonces(annonces):
     """
-    Filtre les annonces actives et met à jour la session state UNIQUEMENT.
-    Ne touche pas à la Google Sheet.
+    Import groupé : écrit toutes les annonces validées en un seul append_many (un seul appel
+    append_rows pour Google Sheets), puis les ajoute au cache partagé. Les doublons (déjà en cache
+    ou répétés dans le fichier) sont écartés. Retourne le nombre d'annonces écrites, ou None en cas d'échec.
     """
-    today_iso = date.today().isoformat()
-    now_time = datetime.now().strftime("%H:%M")
+    store = get_store()
+    if not store:
+        st.warning("Import impossible : la connexion à Google Sheets a échoué.")
+        return None
 
-    active_annonces = []
-    expired_count = 0
+    annonces, _ = get_annonce_cache().find_duplicates(annonces)
 
-    for annonce in st.session_state.annonces:
-        annonce_type = annonce.get('type', 'ponctuel')
+    try:
+        with metrics.stage("import"):
+            store.append_many(annonces)
+    except Exception as e:
+        st.error(f"Erreur critique lors de l'import des annonces dans Google Sheets: {e}")
+        return None
 
-        is_expired = False
+    get_annonce_cache().add_many(annonces)
+    return len(annonces)
 
-        if annonce_type == 'periode':
-            date_fin = annonce.get('date_fin')
-            if not date_fin or date_fin < today_iso:
-                is_expired = True
 
-        elif annonce_type == 'ponctuel':
-            date_evt = annonce.get('date_evenement')
-            heure_evt = annonce.get('heure_evenement', '00:00')
+def filter_and_cleanup_annonces(window_end=None, filters=None):
+    """
+    Filtre les annonces actives et retire les annonces expirées du cache partagé UNIQUEMENT.
+    Ne touche pas à la Google Sheet. Les séries récurrentes sont remplacées par leurs
+    occurrences à venir jusqu'à window_end (date), générées à la demande.
+    filters : critères de recherche (voir AnnonceCache.search), résolus par les index en mémoire.
+    Le résultat est mémorisé dans la session jusqu'au prochain changement du cache, des filtres
+    ou de la minute courante : la même liste (même objet) est alors retournée sans recalcul.
+    """
+    load_annonces()
+    cache = get_annonce_cache()
+    filters = filters or {}
+    today = date.today()
+    now = (today.isoformat(), datetime.now().strftime("%H:%M"))
+
+    with metrics.stage("filter"):
+        # Les annonces sont indexées par instant d'expiration : seules les nouvelles expirées sont dépilées
+        expired_annonces = cache.pop_expired(*now)
+        expired_count = len(expired_annonces)
+
+    if filters.get("text"):
+        # Recherche plein texte : les descriptions non encore lues sont chargées une fois, puis indexées
+        store = get_store()
+        try:
+            if store and not cache.load_search_details(store):
+                cache.mark_stale()
+        except Exception as e:
+            st.warning(f"Recherche limitée aux titres : descriptions indisponibles. Détail: {e}")
+
+    # Expiration à la minute près : la liste ne peut pas changer avant la minute suivante
+    memo_key = (id(cache), cache.version, now, window_end, sorted(filters.items()))
+    memo = st.session_state.get("active_annonces_memo")
+    if memo is not None and memo[0] == memo_key:
+        metrics.count("cache_hit.active_annonces")
+        return memo[1], expired_count
+
+    with metrics.stage("search"):
+        window_start = max(today, filters.get("date_min") or today)
+        window_end = filters.get("date_max") or window_end or window_start + timedelta(days=RECURRENCE_HORIZON_DAYS)
+
+        # Déjà triées par date de début
+        records = cache.search(**filters) if filters else cache.records
+        active_annonces = expand_recurrences(records, window_start, window_end, now)
+
+    st.session_state.active_annonces_memo = (memo_key, active_annonces)
+    return active_annonces, expired_count
 
-            if not date_evt:
-                is_expired = True
-            elif date_evt < today_iso:
-                is_expired = True
-            elif date_evt == today_iso and heure_evt < now_time:
-                is_expired = True
 
-        if is_expired:
-            expired_count += 1
-        else:
-            active_annonces.append(annonce)
+def archive_expired_annonces():
+    """
+    Compaction : déplace les lignes terminées avant aujourd'hui vers l'archive (onglet "archive"
+    pour Google Sheets) afin de garder la feuille active petite. Retourne le nombre de lignes déplacées.
+    """
+    store = get_store()
+    if not store:
+        st.warning("Archivage impossible : la connexion à Google Sheets a échoué.")
+        return 0
 
-    # Mise à jour de la session state (nettoyage local/affiché)
-    if expired_count > 0:
-        st.session_state.annonces = active_annonces
-        # L'appel à save_annonces (sauvegarde distante) est bien retiré.
+    try:
+        moved = store.archive(date.today().isoformat(), batch_size=STORAGE_CONFIG.get("archive_batch_size", 500))
+    except Exception as e:
+        st.error(f"Erreur lors de l'archivage des annonces expirées. Détail: {e}")
+        return 0
 
-    return active_annonces, expired_count
+    # Les lignes ont bougé : le cache se resynchronise (rechargement complet si nécessaire)
+    load_annonces(force=True)
+    return moved
 
 
 # --- Fonction de Connexion (CORRIGÉE) ---
@@ -212,8 +487,8 @@ def check_login(username, password):
 def logout():
     """Déconnecte l'utilisateur et recharge les données depuis Google Sheets."""
     st.session_state.logged_in = False
-    # On recharge les données au moment de la déconnexion pour s'assurer que la prochaine session est à jour
-    st.session_state.annonces = load_annonces()
+    # On synchronise les données au moment de la déconnexion pour s'assurer que la prochaine session est à jour
+    load_annonces(force=True)
 
 
 def show_login_page():
@@ -245,6 +520,478 @@ def show_login_page():
                     check_login(username, password)
 
 
+# --- Panneau de performance (admin) ---
+
+def show_metrics_panel(recorder, last_rerun):
+    """Affiche les durées du dernier rerun et les percentiles p50/p95 sur l'historique."""
+    import pandas as pd
+
+    with st.expander("📊 Performance (admin)"):
+        st.markdown(f"**Dernier rerun :** {last_rerun.total * 1000:.1f} ms")
+        st.dataframe(
+            pd.DataFrame(
+                {"ms": {name: seconds * 1000 for name, seconds in last_rerun.stages.items()}}
+            ).round(2),
+            width="stretch",
+        )
+        if last_rerun.counters:
+            st.caption(" · ".join(f"{name} : {value}" for name, value in sorted(last_rerun.counters.items())))
+
+        st.markdown(f"**Sur les {len(recorder.history())} derniers reruns**")
+        summary = pd.DataFrame(recorder.summary()).T
+        st.dataframe((summary[["p50", "p95", "max"]] * 1000).round(2).assign(n=summary["n"].astype(int)),
+                     width="stretch")
+        st.caption(" · ".join(f"{name} : {value}" for name, value in sorted(recorder.counter_totals().items())))
+
+
+# --- Affichage paginé des rappels ---
+
+REMINDERS_PAGE_SIZES = [10, 25, 50, 100]
+
+# Occurrences des séries récurrentes générées sur cet horizon (à partir d'aujourd'hui ou de la date choisie)
+RECURRENCE_HORIZON_DAYS = 90
+
+REMINDER_TYPES = {"periode": "Période", "ponctuel": "Ponctuel", "recurrent": "Récurrent"}
+
+# L'onglet Rappels se relance seul à cet intervalle (ajouts des autres sessions, événements expirés) ;
+# sans changement du cache ni de la minute, la liste mémorisée est réaffichée sans recalcul
+REMINDERS_REFRESH_SECONDS = 60
+
+# Attente maximale du premier chargement avant d'afficher l'onglet Rappels sans les annonces
+LOAD_TIMEOUT_SECONDS = STORAGE_CONFIG.get("load_timeout", 30)
+
+
+def show_search_filters():
+    """
+    Champ de recherche et filtres des rappels (texte, paroisse, type, dates).
+    Retourne les filtres actifs pour AnnonceCache.search ({} si aucun).
+    """
+    col_text, col_paroisse, col_type, col_dates = st.columns([3, 2, 1, 2])
+    with col_text:
+        text = st.text_input("🔎 Rechercher", placeholder="Titre ou description", key="reminders_search",
+                             on_change=_reset_reminders_page)
+    with col_paroisse:
+        paroisse = st.selectbox("Paroisse", [None] + get_annonce_cache().paroisses(),
+                                format_func=lambda value: value or "Toutes", key="reminders_paroisse",
+                                on_change=_reset_reminders_page)
+    with col_type:
+        annonce_type = st.selectbox("Type", [None] + list(REMINDER_TYPES),
+                                    format_func=lambda value: REMINDER_TYPES.get(value, "Tous"), key="reminders_type",
+                                    on_change=_reset_reminders_page)
+    with col_dates:
+        dates = st.date_input("Dates", value=(), key="reminders_dates", format="DD/MM/YYYY",
+                              on_change=_reset_reminders_page)
+
+    filters = {"text": text.strip(), "paroisse": paroisse, "annonce_type": annonce_type,
+               "date_min": dates[0] if len(dates) > 0 else None,
+               "date_max": dates[1] if len(dates) > 1 else None}
+    return {name: value for name, value in filters.items() if value}
+
+
+def _reset_reminders_page():
+    """Revient à la première page quand les options d'affichage changent."""
+    st.session_state.reminders_page = 1
+
+
+def show_reminders_page(reminders):
+    """
+    Affiche une page de rappels : un seul élément Streamlit par page, quel que soit le
+    nombre total d'événements (taille de page, regroupement par paroisse).
+    """
+    col_size, col_group = st.columns(2)
+    with col_size:
+        page_size = st.selectbox("Rappels par page", REMINDERS_PAGE_SIZES, index=1,
+                                 key="reminders_page_size", on_change=_reset_reminders_page)
+    with col_group:
+        st.markdown("<div style='margin-top: 32px;'></div>", unsafe_allow_html=True)
+        group_by_paroisse = st.toggle("Grouper par paroisse", key="reminders_group",
+                                      on_change=_reset_reminders_page)
+
+    if group_by_paroisse:
+        reminders = reminders.sort_values("paroisse", kind="stable")
+
+    page_count = -(-len(reminders) // page_size)
+    if st.session_state.get("reminders_page", 1) > page_count:
+        st.session_state.reminders_page = page_count
+    page = st.number_input(f"Page (sur {page_count})", min_value=1, max_value=page_count, step=1,
+                           key="reminders_page")
+
+    start = (page - 1) * page_size
+    page_rows = reminders.iloc[start:start + page_size]
+
+    # Descriptions lues à la demande, pour les seules annonces de la page (une fois par série récurrente)
+    page_annonces = list(page_rows["annonce"])
+    details = list({id(a.serie or a): a.serie or a for a in page_annonces}.values())
+    store = get_store()
+    if store:
+        try:
+            if not store.load_details(details):
+                # Feuille modifiée (archivage par un autre processus...) : resynchronisation au prochain rerun
+                get_annonce_cache().mark_stale()
+        except Exception as e:
+            st.warning(f"Descriptions indisponibles. Détail: {e}")
+    page_rows = page_rows.assign(
+        description=[(a.serie or a).get('evenement_description', 'Pas de description') for a in page_annonces])
+
+    cards = []
+    current_paroisse = None
+    for row in page_rows.itertuples(index=False):
+        if group_by_paroisse and row.paroisse != current_paroisse:
+            current_paroisse = row.paroisse
+            cards.append(f"#### ⛪ {escape_markdown(current_paroisse)}")
+        cards.append(reminder_card_markdown(row))
+
+    st.caption(f"Événements {start + 1} à {start + len(page_rows)} sur {len(reminders)}")
+    st.markdown("\n\n".join(cards), unsafe_allow_html=True)
+
+
+# --- Onglets (fragments : une interaction ne relance que l'onglet concerné, pas toute la page) ---
+
+def measured_fragment(run_every=None):
+    """st.fragment dont les relances seules sont mesurées comme des entrées à part (voir metrics.fragment_run)."""
+    def decorator(func):
+        @functools.wraps(func)
+        def run_fragment():
+            with metrics.fragment_run(get_metrics_recorder(), func.__name__):
+                func()
+        return st.fragment(run_fragment, run_every=run_every)
+    return decorator
+
+
+@measured_fragment()
+def show_period_form():
+    """Formulaire d'ajout d'un événement sur une période."""
+    st.markdown("<h4 style='font-size: 1.5rem; margin-top: 0;'>Ajouter un nouvel événement sur une période</h4>",
+                unsafe_allow_html=True)
+    show_pending_success("periode")
+
+    with st.form("add_event_period_form", clear_on_submit=True):
+
+        paroisse_input_period = st.text_input(
+            "1. Nom de la Paroisse",
+            placeholder="Ex: Paroisse Saint-Pierre",
+            key="paroisse_period"
+        )
+
+        evenement_titre_input_period = st.text_input(
+            "2. Titre de l'Événement",
+            placeholder="Ex: Campagne d'évangélisation, Fête paroissiale",
+            key="titre_period"
+        )
+
+        evenement_description_input_period = st.text_area(
+            "3. Description de l'Événement",
+            placeholder="Ex: Campagne de 10 jours,...",
+            key="desc_period"
+        )
+
+        col_date_debut, col_date_fin = st.columns(2)
+
+        with col_date_debut:
+            date_debut_input = st.date_input(
+                "4. Date de Début",
+                min_value=date.today(),
+                value=date.today(),
+                key="date_debut"
+            )
+
+        with col_date_fin:
+            min_date_fin = date_debut_input if date_debut_input else date.today()
+            date_fin_input = st.date_input(
+                "5. Date de Fin",
+                min_value=min_date_fin,
+                value=min_date_fin,
+                key="date_fin"
+            )
+
+        heure_evenement_input_period = st.time_input(
+            "6. Heure de l'Événement",
+            value=time(10, 0),
+            key="heure_period"
+        )
+
+        submitted_period = st.form_submit_button("Enregistrer")
+
+        if submitted_period:
+            if date_debut_input > date_fin_input:
+                st.error("La date de fin ne peut pas être antérieure à la date de début.")
+            elif paroisse_input_period and evenement_titre_input_period and evenement_description_input_period:
+                add_annonce_periode(
+                    paroisse=paroisse_input_period,
+                    evenement_titre=evenement_titre_input_period,
+                    evenement_description=evenement_description_input_period,
+                    date_debut=date_debut_input.isoformat(),
+                    date_fin=date_fin_input.isoformat(),
+                    heure_evenement=heure_evenement_input_period.strftime("%H:%M")
+                )
+            else:
+                st.error("Veuillez remplir tous les champs obligatoires (Paroisse, Titre et Description).")
+
+
+@measured_fragment()
+def show_single_form():
+    """Formulaire d'ajout d'un événement ponctuel."""
+    st.markdown("<h4 style='font-size: 1.5rem; margin-top: 0;'>Ajouter un nouvel événement </h4>",
+                unsafe_allow_html=True)
+    show_pending_success("ponctuel")
+
+    with st.form("add_event_single_form", clear_on_submit=True):
+        paroisse_input_single = st.text_input(
+            "1. Nom de la Paroisse",
+            placeholder="Ex: Paroisse Saint-Pierre",
+            key="paroisse_single"
+        )
+
+        evenement_titre_input_single = st.text_input(  # LIGNE CORRIGÉE
+            "2. Titre de l'Événement",
+            placeholder="Ex: Messe dominicale, Réunion du conseil",
+            key="titre_single"
+        )
+
+        evenement_description_input_single = st.text_area(
+            "3. Description de l'Événement",
+            placeholder="Ex: Messe spéciale pour la fête de Pâques...",
+            key="desc_single"
+        )
+
+        col_date_single, col_heure_single = st.columns(2)
+
+        with col_date_single:
+            date_evenement_input_single = st.date_input(
+                "4. Date de l'Événement",
+                min_value=date.today(),
+                value=date.today(),
+                key="date_single"
+            )
+
+        with col_heure_single:
+            heure_evenement_input_single = st.time_input(
+                "5. Heure de l'Événement",
+                value=time(10, 0),
+                key="heure_single"
+            )
+
+        submitted_single = st.form_submit_button("Enregistrer")
+
+        if submitted_single:
+            if paroisse_input_single and evenement_titre_input_single and evenement_description_input_single:
+                add_annonce_ponctuel(
+                    paroisse=paroisse_input_single,
+                    evenement_titre=evenement_titre_input_single,
+                    evenement_description=evenement_description_input_single,
+                    date_evenement=date_evenement_input_single.isoformat(),
+                    heure_evenement=heure_evenement_input_single.strftime("%H:%M")
+                )
+            else:
+                st.error("Veuillez remplir tous les champs obligatoires (Paroisse, Titre et Description).")
+
+
+@measured_fragment()
+def show_recurrent_form():
+    """Formulaire d'ajout d'une série d'événements récurrents."""
+    st.markdown("<h4 style='font-size: 1.5rem; margin-top: 0;'>Ajouter un événement récurrent</h4>",
+                unsafe_allow_html=True)
+    show_pending_success("recurrent")
+
+    with st.form("add_event_recurrent_form", clear_on_submit=True):
+        paroisse_input_recurrent = st.text_input(
+            "1. Nom de la Paroisse",
+            placeholder="Ex: Paroisse Saint-Pierre",
+            key="paroisse_recurrent"
+        )
+
+        evenement_titre_input_recurrent = st.text_input(
+            "2. Titre de l'Événement",
+            placeholder="Ex: Messe du dimanche, Réunion mensuelle du conseil",
+            key="titre_recurrent"
+        )
+
+        evenement_description_input_recurrent = st.text_area(
+            "3. Description de l'Événement",
+            placeholder="Ex: Messe chaque dimanche à la chapelle...",
+            key="desc_recurrent"
+        )
+
+        col_frequence, col_heure_recurrent = st.columns(2)
+
+        with col_frequence:
+            frequence_input = st.selectbox(
+                "4. Fréquence",
+                list(RECURRENCE_FREQUENCIES),
+                format_func=RECURRENCE_FREQUENCIES.get,
+                key="frequence_recurrent"
+            )
+
+        with col_heure_recurrent:
+            heure_evenement_input_recurrent = st.time_input(
+                "5. Heure de l'Événement",
+                value=time(10, 0),
+                key="heure_recurrent"
+            )
+
+        col_premiere_date, col_date_limite = st.columns(2)
+
+        with col_premiere_date:
+            premiere_date_input = st.date_input(
+                "6. Première Date",
+                min_value=date.today(),
+                value=date.today(),
+                key="premiere_date_recurrent"
+            )
+
+        with col_date_limite:
+            date_limite_input = st.date_input(
+                "7. Jusqu'au",
+                min_value=date.today(),
+                value=date.today() + timedelta(days=365),
+                key="date_limite_recurrent"
+            )
+
+        exceptions_input = st.text_input(
+            "8. Dates exclues (facultatif)",
+            placeholder="Ex: 25/12/2026, 01/01/2027",
+            key="exceptions_recurrent"
+        )
+
+        submitted_recurrent = st.form_submit_button("Enregistrer")
+
+        if submitted_recurrent:
+            try:
+                exceptions = [datetime.strptime(day.strip(), "%d/%m/%Y").date()
+                              for day in exceptions_input.split(",") if day.strip()]
+            except ValueError:
+                exceptions = None
+
+            if premiere_date_input > date_limite_input:
+                st.error("La date de fin ne peut pas être antérieure à la date de début.")
+            elif exceptions is None:
+                st.error("Dates exclues invalides : utilisez le format JJ/MM/AAAA, séparées par des virgules.")
+            elif paroisse_input_recurrent and evenement_titre_input_recurrent and evenement_description_input_recurrent:
+                add_annonce_recurrent(
+                    paroisse=paroisse_input_recurrent,
+                    evenement_titre=evenement_titre_input_recurrent,
+                    evenement_description=evenement_description_input_recurrent,
+                    date_debut=premiere_date_input.isoformat(),
+                    date_fin=date_limite_input.isoformat(),
+                    heure_evenement=heure_evenement_input_recurrent.strftime("%H:%M"),
+                    recurrence=format_recurrence(frequence_input, exceptions)
+                )
+            else:
+                st.error("Veuillez remplir tous les champs obligatoires (Paroisse, Titre et Description).")
+
+
+@measured_fragment()
+def show_import_tab():
+    """Import groupé depuis un fichier CSV ou iCalendar."""
+    st.markdown("<h4 style='font-size: 1.5rem; margin-top: 0;'>Importer des événements depuis un fichier</h4>",
+                unsafe_allow_html=True)
+    show_pending_success("import")
+    st.caption(
+        "CSV : une ligne d'en-têtes parmi " + ", ".join(f"`{column}`" for column in COLUMN_HEADERS)
+        + ". iCalendar (.ics) : SUMMARY → titre, DESCRIPTION → description, LOCATION → paroisse.")
+
+    import_file = st.file_uploader("Fichier à importer", type=["csv", "ics"], key="import_file")
+    import_paroisse = st.text_input(
+        "Paroisse par défaut (si absente du fichier)",
+        placeholder="Ex: Paroisse Saint-Pierre",
+        key="import_paroisse"
+    )
+
+    if import_file is not None:
+        from importers import read_file, validate_rows
+
+        try:
+            import_rows = read_file(import_file.name, import_file.getvalue(), import_paroisse)
+        except (ValueError, UnicodeDecodeError) as e:
+            st.error(f"Fichier illisible : {e}")
+            import_rows = []
+
+        # Toutes les lignes sont validées d'un coup : les erreurs sont listées avant toute écriture
+        valid_annonces, import_errors = validate_rows(import_rows)
+        # Doublons (déjà enregistrés ou répétés dans le fichier) détectés par l'index du cache
+        load_annonces()
+        valid_annonces, duplicate_annonces = get_annonce_cache().find_duplicates(valid_annonces)
+        st.write(f"**{len(valid_annonces)}** événement(s) valide(s), **{len(import_errors)}** en erreur, "
+                 f"**{len(duplicate_annonces)}** doublon(s).")
+
+        if duplicate_annonces:
+            st.warning(f"{len(duplicate_annonces)} événement(s) déjà enregistré(s) seront ignorés : "
+                       + ", ".join(f"'{annonce['evenement_titre']}'" for annonce in duplicate_annonces[:10])
+                       + ("…" if len(duplicate_annonces) > 10 else ""))
+        if import_errors:
+            st.error("Les lignes suivantes seront ignorées :")
+            st.dataframe([error.to_dict() for error in import_errors], width="stretch", hide_index=True)
+        if valid_annonces:
+            with st.expander("Aperçu des événements à importer"):
+                st.dataframe(valid_annonces, width="stretch", hide_index=True)
+
+        imported_files = st.session_state.setdefault("imported_files", set())
+        if import_file.file_id in imported_files:
+            st.info("Ce fichier a déjà été importé.")
+        elif valid_annonces and st.button(f"Importer {len(valid_annonces)} événement(s)", key="import_button"):
+            imported = import_annonces(valid_annonces)
+            if imported is not None:
+                imported_files.add(import_file.file_id)
+                _rerun_with_success("import", f"**{imported}** événement(s) importé(s).")
+
+
+@measured_fragment(run_every=REMINDERS_REFRESH_SECONDS)
+def show_reminders_tab():
+    """Rappels actifs : recherche, filtres, archivage et liste paginée."""
+    st.markdown("<h4 style='font-size: 1.5rem; margin-top: 0;'>🔔 Vos Rappels d'Événements Actifs</h4>",
+                unsafe_allow_html=True)
+    st.write(f"Date du jour utilisée pour le filtre : **{date.today().strftime('%d/%m/%Y')}**")
+
+    # 1. Filtrage et Nettoyage (le premier chargement se fait en arrière-plan).
+    # Relancé ici : une relance du seul fragment n'exécute pas le démarrage du script, et le cache
+    # peut avoir été recréé entre-temps (cache_ttl)
+    start_loading_annonces()
+    if not get_annonce_cache().loaded.is_set():
+        with st.spinner("Chargement des annonces depuis Google Sheets…"):
+            loaded = get_annonce_cache().loaded.wait(LOAD_TIMEOUT_SECONDS)
+        if not loaded:
+            st.warning("Le chargement des annonces prend plus de temps que prévu. Elles s'afficheront "
+                       "à la prochaine actualisation de cet onglet.")
+            return
+
+    # Recherche et filtres résolus par les index en mémoire (sans relire toutes les annonces)
+    search_filters = show_search_filters()
+    active_annonces, expired_count = filter_and_cleanup_annonces(filters=search_filters)
+
+    if expired_count > 0:
+        st.info(
+            f"🗑️ **{expired_count}** événement(s) passé(s) ont été automatiquement nettoyé(s) de votre vue locale. Ces entrées existent toujours dans Google Sheets.")
+
+    with st.expander("🗄️ Archivage des événements passés"):
+        st.caption("Déplace les événements terminés vers l'onglet \"archive\" pour alléger la feuille principale.")
+        if st.button("Archiver maintenant", key="archive_button"):
+            moved = archive_expired_annonces()
+            st.success(f"**{moved}** événement(s) archivé(s).")
+
+    # 2. Affichage
+    if not active_annonces and search_filters:
+        st.info("Aucun événement ne correspond à votre recherche.")
+    elif not active_annonces:
+        st.success("🎉 Aucun événement actif trouvé (en cours ou à venir).")
+    else:
+        if search_filters:
+            st.subheader(f"Événements correspondant à la recherche : {len(active_annonces)}")
+        else:
+            st.subheader(f"Total des événements actifs : {len(active_annonces)}")
+
+        # Statuts calculés en une seule passe vectorisée, affichage page par page ;
+        # recalculés seulement quand la liste des rappels actifs a changé (nouvel objet)
+        memo = st.session_state.get("reminders_memo")
+        if memo is not None and memo[0] is active_annonces:
+            reminders = memo[1]
+        else:
+            with metrics.stage("status_table"):
+                reminders = status_table(active_annonces)
+            st.session_state.reminders_memo = (active_annonces, reminders)
+        with metrics.stage("render"):
+            show_reminders_page(reminders)
+
+
 # --- APPLICATION PRINCIPALE (Logique de Flux) ---
 
 if not st.session_state.logged_in:
@@ -265,6 +1012,22 @@ else:
 
     with col_status:
         st.markdown(f"**Connecté :** `{HARDCODED_USERNAME}`", unsafe_allow_html=True)
+        if len(SOURCES) > 1:
+            # Chaque source a son cache, chargé en parallèle des autres : changer de source n'attend pas
+            st.selectbox("Source", list(SOURCES), key="source", label_visibility="collapsed")
+        if STORAGE_CONFIG.get("write_queue", True):
+            # Toutes les files d'écriture sont démarrées (rejeu des journaux de chaque source)
+            writers = [get_annonce_writer(source_name) for source_name in SOURCES]
+            pending_writes = sum(writer.pending_count() for writer in writers)
+            if pending_writes:
+                st.caption(f"⏳ {pending_writes} annonce(s) en attente d'écriture dans Google Sheets")
+                write_error = next((writer.last_error for writer in writers if writer.last_error is not None), None)
+                if write_error is not None:
+                    st.caption(f"Dernière erreur d'écriture : {escape_markdown(write_error)}")
+            rejected = [item for writer in writers for item in writer.rejected]
+            if rejected:
+                st.warning(f"{len(rejected)} annonce(s) refusée(s) par Google Sheets, conservée(s) dans le journal "
+                           f"d'écriture. Dernière erreur : {escape_markdown(rejected[-1][2])}")
         st.markdown("<div style='margin-bottom: 20px;'></div>", unsafe_allow_html=True)
 
     with col_logout:
@@ -272,239 +1035,39 @@ else:
 
     st.markdown("---")
 
+    source_error = get_annonce_cache().last_error
+    if source_error is not None:
+        # Échec isolé à cette source : les autres restent consultables
+        st.warning(f"Chargement de la source **'{current_source()}'** impossible. Détail: {source_error}")
+
     # Création des onglets
-    tab_add_period, tab_add_single, tab_reminders = st.tabs(
-        ["➕ Event périodique ", "➕ Event ponctuel", "🔔 Rappels"])
+    tab_add_period, tab_add_single, tab_add_recurrent, tab_import, tab_reminders = st.tabs(
+        ["➕ Event périodique ", "➕ Event ponctuel", "🔁 Event récurrent", "📥 Import groupé", "🔔 Rappels"])
 
     # --- Onglet 1: Enregistrement Événement Période (Multi-Jours) ---
     with tab_add_period:
-        st.markdown("<h4 style='font-size: 1.5rem; margin-top: 0;'>Ajouter un nouvel événement sur une période</h4>",
-                    unsafe_allow_html=True)
-
-        with st.form("add_event_period_form", clear_on_submit=True):
-
-            paroisse_input_period = st.text_input(
-                "1. Nom de la Paroisse",
-                placeholder="Ex: Paroisse Saint-Pierre",
-                key="paroisse_period"
-            )
-
-            evenement_titre_input_period = st.text_input(
-                "2. Titre de l'Événement",
-                placeholder="Ex: Campagne d'évangélisation, Fête paroissiale",
-                key="titre_period"
-            )
-
-            evenement_description_input_period = st.text_area(
-                "3. Description de l'Événement",
-                placeholder="Ex: Campagne de 10 jours,...",
-                key="desc_period"
-            )
-
-            col_date_debut, col_date_fin = st.columns(2)
-
-            with col_date_debut:
-                date_debut_input = st.date_input(
-                    "4. Date de Début",
-                    min_value=date.today(),
-                    value=date.today(),
-                    key="date_debut"
-                )
-
-            with col_date_fin:
-                min_date_fin = date_debut_input if date_debut_input else date.today()
-                date_fin_input = st.date_input(
-                    "5. Date de Fin",
-                    min_value=min_date_fin,
-                    value=min_date_fin,
-                    key="date_fin"
-                )
-
-            heure_evenement_input_period = st.time_input(
-                "6. Heure de l'Événement",
-                value=time(10, 0),
-                key="heure_period"
-            )
-
-            submitted_period = st.form_submit_button("Enregistrer")
-
-            if submitted_period:
-                if date_debut_input > date_fin_input:
-                    st.error("La date de fin ne peut pas être antérieure à la date de début.")
-                elif paroisse_input_period and evenement_titre_input_period and evenement_description_input_period:
-                    add_annonce_periode(
-                        paroisse=paroisse_input_period,
-                        evenement_titre=evenement_titre_input_period,
-                        evenement_description=evenement_description_input_period,
-                        date_debut=date_debut_input.isoformat(),
-                        date_fin=date_fin_input.isoformat(),
-                        heure_evenement=heure_evenement_input_period.strftime("%H:%M")
-                    )
-                else:
-                    st.error("Veuillez remplir tous les champs obligatoires (Paroisse, Titre et Description).")
+        show_period_form()
 
     # --- Onglet 2: Enregistrement Événement Ponctuel (Date Unique) ---
     with tab_add_single:
-        st.markdown("<h4 style='font-size: 1.5rem; margin-top: 0;'>Ajouter un nouvel événement </h4>",
-                    unsafe_allow_html=True)
-
-        with st.form("add_event_single_form", clear_on_submit=True):
-            paroisse_input_single = st.text_input(
-                "1. Nom de la Paroisse",
-                placeholder="Ex: Paroisse Saint-Pierre",
-                key="paroisse_single"
-            )
-
-            evenement_titre_input_single = st.text_input(  # LIGNE CORRIGÉE
-                "2. Titre de l'Événement",
-                placeholder="Ex: Messe dominicale, Réunion du conseil",
-                key="titre_single"
-            )
+        show_single_form()
 
-            evenement_description_input_single = st.text_area(
-                "3. Description de l'Événement",
-                placeholder="Ex: Messe spéciale pour la fête de Pâques...",
-                key="desc_single"
-            )
-
-            col_date_single, col_heure_single = st.columns(2)
-
-            with col_date_single:
-                date_evenement_input_single = st.date_input(
-                    "4. Date de l'Événement",
-                    min_value=date.today(),
-                    value=date.today(),
-                    key="date_single"
-                )
+    # --- Onglet 3: Enregistrement Événement Récurrent (une ligne par série) ---
+    with tab_add_recurrent:
+        show_recurrent_form()
 
-            with col_heure_single:
-                heure_evenement_input_single = st.time_input(
-                    "5. Heure de l'Événement",
-                    value=time(10, 0),
-                    key="heure_single"
-                )
+    # --- Onglet 4: Import groupé (CSV / iCalendar) ---
+    with tab_import:
+        show_import_tab()
 
-            submitted_single = st.form_submit_button("Enregistrer")
-
-            if submitted_single:
-                if paroisse_input_single and evenement_titre_input_single and evenement_description_input_single:
-                    add_annonce_ponctuel(
-                        paroisse=paroisse_input_single,
-                        evenement_titre=evenement_titre_input_single,
-                        evenement_description=evenement_description_input_single,
-                        date_evenement=date_evenement_input_single.isoformat(),
-                        heure_evenement=heure_evenement_input_single.strftime("%H:%M")
-                    )
-                else:
-                    st.error("Veuillez remplir tous les champs obligatoires (Paroisse, Titre et Description).")
-
-    # --- Onglet 3: Rappels Actifs ---
+    # --- Onglet 5: Rappels Actifs ---
     with tab_reminders:
-        st.markdown("<h4 style='font-size: 1.5rem; margin-top: 0;'>🔔 Vos Rappels d'Événements Actifs</h4>",
-                    unsafe_allow_html=True)
-        st.write(f"Date du jour utilisée pour le filtre : **{date.today().strftime('%d/%m/%Y')}**")
-
-        # 1. Filtrage et Nettoyage
-        active_annonces, expired_count = filter_and_cleanup_annonces()
+        show_reminders_tab()
 
-        if expired_count > 0:
-            st.info(
-                f"🗑️ **{expired_count}** événement(s) passé(s) ont été automatiquement nettoyé(s) de votre vue locale. Ces entrées existent toujours dans Google Sheets.")
 
-        # 2. Affichage
-        if not active_annonces:
-            st.success("🎉 Aucun événement actif trouvé (en cours ou à venir).")
-        else:
-            def sort_key(annonce):
-                if annonce.get('type') == 'periode':
-                    # Utilise la date de début pour le tri
-                    return annonce.get('date_debut', date.today().isoformat())
-                    # Utilise la date de l'événement pour le tri
-                return annonce.get('date_evenement', date.today().isoformat())
-
-
-            active_annonces.sort(key=sort_key)
-
-            st.subheader(f"Total des événements actifs : {len(active_annonces)}")
+# --- Instrumentation (fin du rerun) ---
 
-            for annonce in active_annonces:
-
-                paroisse_name = annonce.get('paroisse', 'Paroisse Inconnue')
-                titre = annonce.get('evenement_titre', 'Titre manquant')
-                description = annonce.get('evenement_description', 'Pas de description')
-                heure_evt = annonce.get('heure_evenement', 'Non spécifiée')
-
-                annonce_type = annonce.get('type', 'ponctuel')
-                today_date = date.today()
-
-                status_text = "Statut indéterminé"
-                alert_color = 'gray'
-                period_caption = ""
-
-                try:
-                    if annonce_type == 'periode':
-                        date_debut = date.fromisoformat(annonce.get('date_debut'))
-                        date_fin = date.fromisoformat(annonce.get('date_fin'))
-
-                        if today_date >= date_debut and today_date <= date_fin:
-                            days_remaining = (date_fin - today_date).days
-                            if days_remaining == 0:
-                                status_text = f"🔥 **DERNIER JOUR AUJOURD'HUI !** (jusqu'à {heure_evt})"
-                                alert_color = 'red'
-                            elif days_remaining <= 3:
-                                status_text = f"🚨 **EN COURS :** Termine dans {days_remaining} jour(s)"
-                                alert_color = 'red'
-                            else:
-                                status_text = f"▶️ **EN COURS** (Termine le {date_fin.strftime('%d/%m/%Y')})"
-                                alert_color = 'green'
-
-                        elif today_date < date_debut:
-                            days_to_start = (date_debut - today_date).days
-                            if days_to_start == 1:
-                                status_text = f"🚨 **DEMAIN :** Commence !"
-                                alert_color = 'red'
-                            elif days_to_start <= 7:
-                                status_text = f"⚠️ Bientôt : Commence dans {days_to_start} jours"
-                                alert_color = 'orange'
-                            else:
-                                status_text = f"📅 Prévu : Commence dans {days_to_start} jours"
-                                alert_color = 'blue'
-
-                        period_caption = f"Période : Du **{date_debut.strftime('%d/%m/%Y')}** au **{date_fin.strftime('%d/%m/%Y')}** à partir de **{heure_evt}**"
-
-                    elif annonce_type == 'ponctuel':
-                        date_evt = date.fromisoformat(annonce.get('date_evenement'))
-                        days_to_start = (date_evt - today_date).days
-
-                        if days_to_start == 0:
-                            status_text = f"🔥 **AUJOURD'HUI !** à **{heure_evt}**"
-                            alert_color = 'red'
-                        elif days_to_start == 1:
-                            status_text = f"🚨 **DEMAIN !** à **{heure_evt}**"
-                            alert_color = 'red'
-                        elif days_to_start <= 7:
-                            status_text = f"⚠️ Bientôt : Dans {days_to_start} jours"
-                            alert_color = 'orange'
-                        else:
-                            status_text = f"📅 Prévu : Dans {days_to_start} jours"
-                            alert_color = 'blue'
-
-                        period_caption = f"Date : **{date_evt.strftime('%d/%m/%Y')}** à **{heure_evt}**"
-
-
-                except (TypeError, ValueError, KeyError):
-                    status_text = f"Date(s) invalide(s) (Type: {annonce_type})"
-                    alert_color = 'gray'
-                    period_caption = "Erreur de données"
-
-                with st.container():
-                    st.markdown(f"**Paroisse :** {paroisse_name}")
-                    st.markdown(f"**Titre :** {titre}")
-                    st.markdown(f"**Description :** {description}")
-                    st.caption(period_caption)
-
-                    st.markdown(
-                        f'<div style="font-size: 1.0em; padding-top: 5px; font-weight: bold; color: {alert_color};"> {status_text}</div>',
-                        unsafe_allow_html=True)
-
-                    st.markdown("--- ")
+metrics_recorder = get_metrics_recorder()
+metrics_recorder.record(rerun_metrics)
+if METRICS_CONFIG.get("admin_panel", False) and st.session_state.logged_in:
+    show_metrics_panel(metrics_recorder, rerun_metrics)
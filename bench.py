@@ -0,0 +1,400 @@
+"""
+Banc d'essai hors ligne : feuille gspread simulée en mémoire + générateur d'annonces synthétiques.
+
+    python bench.py --sizes 1000 10000 100000 --latency 0.05 --json bench.json
+
+Mesure le temps et le pic mémoire du chargement, du filtrage, du tri, du calcul des statuts,
+du rendu et des ajouts, sans réseau ni secrets Streamlit.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+from annonces import COLUMN_HEADERS, ExpiryIndex, reminder_card_markdown, status_table
+from storage import AnnonceCache, SheetStore
+from writer import AnnonceWriter
+
+
+# --- Feuille gspread simulée ---
+
+class FakeAPIError(Exception):
+    """Erreur imitant gspread.exceptions.APIError (code HTTP dans `code`)."""
+
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+
+
+class FakeSpreadsheet:
+    """Classeur en mémoire : onglets par titre et batch_update (deleteDimension)."""
+
+    _next_id = 0
+
+    def __init__(self, api):
+        FakeSpreadsheet._next_id += 1
+        self.id = f"fake-spreadsheet-{FakeSpreadsheet._next_id}"
+        self.api = api
+        self.worksheets = {}
+
+    def worksheet(self, title):
+        self.api.call()
+        if title not in self.worksheets:
+            from gspread.exceptions import WorksheetNotFound
+            raise WorksheetNotFound(title)
+        return self.worksheets[title]
+
+    def add_worksheet(self, title, rows=1, cols=1):
+        self.api.call()
+        return FakeWorksheet(title, spreadsheet=self)
+
+    def batch_update(self, body):
+        self.api.call()
+        for request in body["requests"]:
+            grid = request["deleteDimension"]["range"]
+            worksheet = next(ws for ws in self.worksheets.values() if ws.id == grid["sheetId"])
+            del worksheet.values[grid["startIndex"]:grid["endIndex"]]
+
+
+class FakeApi:
+    """Compteur d'appels avec latence simulée et quota (appels par fenêtre glissante)."""
+
+    def __init__(self, latency=0.0, rate_limit=None, window=60.0):
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.window = window
+        self.calls = 0
+        self._recent = deque()
+        self._lock = threading.Lock()
+
+    def call(self):
+        with self._lock:
+            self.calls += 1
+            now = time.monotonic()
+            while self._recent and now - self._recent[0] > self.window:
+                self._recent.popleft()
+            if self.rate_limit is not None and len(self._recent) >= self.rate_limit:
+                raise FakeAPIError(429, "Quota exceeded for quota metric 'Write requests'")
+            self._recent.append(now)
+        if self.latency:
+            time.sleep(self.latency)
+
+
+class FakeWorksheet:
+    """Sous-ensemble de gspread.Worksheet utilisé par SheetStore, stocké en mémoire."""
+
+    _next_id = 0
+
+    def __init__(self, title="annonce", spreadsheet=None, api=None, headers=COLUMN_HEADERS):
+        FakeWorksheet._next_id += 1
+        self.id = FakeWorksheet._next_id
+        self.title = title
+        self.spreadsheet = spreadsheet or FakeSpreadsheet(api or FakeApi())
+        self.spreadsheet.worksheets[title] = self
+        self.values = [list(headers)]
+
+    @property
+    def api(self):
+        return self.spreadsheet.api
+
+    def get_all_values(self):
+        self.api.call()
+        width = max(len(row) for row in self.values)
+        return [row + [""] * (width - len(row)) for row in self.values]
+
+    def get_all_records(self, head=1, empty2zero=False):
+        values = self.get_all_values()
+        headers = values[head - 1]
+        return [dict(zip(headers, row)) for row in values[head:]]
+
+    def batch_get(self, ranges, major_dimension="ROWS"):
+        self.api.call()
+        results = []
+        for a1 in ranges:
+            first_col, last_col, rows = self._rows(a1)
+            if major_dimension == "COLUMNS":
+                width = last_col - first_col + 1 if last_col is not None else max(map(len, rows), default=0)
+                columns = [_trim([row[i] if i < len(row) else "" for row in rows])
+                           for i in range(first_col, first_col + width)]
+                while columns and not columns[-1]:
+                    columns.pop()
+                results.append(columns)
+            else:
+                end = None if last_col is None else last_col + 1
+                rows = [_trim(row[first_col:end]) for row in rows]
+                while rows and not rows[-1]:
+                    rows.pop()
+                results.append(rows)
+        return results
+
+    def _rows(self, a1):
+        """Plages prises en charge : "5:9" (lignes), "A5:I", "C5:C" ou "A5:I9" (colonnes)."""
+        start, _, end = a1.partition(":")
+        first_letters = start.rstrip("0123456789")
+        last_letters = end.rstrip("0123456789")
+        first = int(start[len(first_letters):])
+        last = end[len(last_letters):]
+        rows = self.values[first - 1:int(last) if last else None]
+        if not first_letters:
+            return 0, None, rows
+        return _column_index(first_letters), _column_index(last_letters), rows
+
+    def row_values(self, row):
+        self.api.call()
+        return list(self.values[row - 1])
+
+    def append_row(self, values, value_input_option='RAW'):
+        self.append_rows([values], value_input_option)
+
+    def append_rows(self, values, value_input_option='RAW'):
+        self.api.call()
+        self.values.extend([str(value) for value in row] for row in values)
+
+    def update(self, range_name=None, values=None, **kwargs):
+        """Plages prises en charge : une cellule de départ ("A1")."""
+        self.api.call()
+        letters = range_name.rstrip("0123456789")
+        first_row, first_column = int(range_name[len(letters):]), _column_index(letters)
+        for i, row in enumerate(values):
+            while len(self.values) < first_row + i:
+                self.values.append([])
+            target = self.values[first_row - 1 + i]
+            target.extend([""] * (first_column + len(row) - len(target)))
+            target[first_column:first_column + len(row)] = [str(value) for value in row]
+
+    def delete_rows(self, start, end=None):
+        self.api.call()
+        del self.values[start - 1:(end or start)]
+
+
+def _column_index(letters):
+    """Index 0-based d'une lettre de colonne A1 (A -> 0, AA -> 26)."""
+    index = 0
+    for letter in letters:
+        index = index * 26 + ord(letter) - ord('A') + 1
+    return index - 1
+
+
+def _trim(values):
+    while values and values[-1] == "":
+        values.pop()
+    return values
+
+
+# --- Données synthétiques ---
+
+def generate_annonces(count, seed=0, today=None, paroisses=50):
+    """Génère `count` annonces 'periode'/'ponctuel' réparties sur ±180 jours autour d'aujourd'hui."""
+    rng = random.Random(seed)
+    today = today or date.today()
+    annonces = []
+    for i in range(count):
+        debut = today + timedelta(days=rng.randint(-180, 180))
+        annonce = {
+            "paroisse": f"Paroisse {i % paroisses}",
+            "evenement_titre": f"Événement {i}",
+            "evenement_description": "Description " + "x" * rng.randint(20, 200),
+            "heure_evenement": f"{rng.randint(7, 21):02d}:{rng.choice(['00', '15', '30', '45'])}",
+            "created_at": (debut - timedelta(days=rng.randint(1, 60))).isoformat(),
+        }
+        if rng.random() < 0.4:
+            annonce.update(type="periode", date_debut=debut.isoformat(),
+                           date_fin=(debut + timedelta(days=rng.randint(0, 14))).isoformat())
+        else:
+            annonce.update(type="ponctuel", date_evenement=debut.isoformat())
+        annonces.append(annonce)
+    return annonces
+
+
+def make_worksheet(annonces, api=None):
+    """Feuille simulée pré-remplie (sans compter ces écritures dans les appels API)."""
+    worksheet = FakeWorksheet(api=api)
+    worksheet.values.extend([str(annonce.get(header, "")) for header in COLUMN_HEADERS] for annonce in annonces)
+    return worksheet
+
+
+# --- Mesures ---
+
+def measure(fn):
+    """Exécute fn deux fois : une pour le temps, une sous tracemalloc pour le pic mémoire."""
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return elapsed, peak
+
+
+def run_benchmarks(size, latency=0.0, rate_limit=None, page_size=25, seed=0):
+    """Lance toutes les mesures pour `size` annonces. Retourne {étape: {"seconds", "peak_bytes", "api_calls"}}."""
+    annonces = generate_annonces(size, seed=seed)
+    today_iso = date.today().isoformat()
+    now_time = datetime.now().strftime("%H:%M")
+    results = {}
+
+    def record(stage, fn, api=None):
+        calls_before = api.calls if api else 0
+        seconds, peak = measure(fn)
+        results[stage] = {
+            "seconds": seconds,
+            "peak_bytes": peak,
+            # Deux exécutions par mesure
+            "api_calls": (api.calls - calls_before) // 2 if api else 0,
+        }
+
+    api = FakeApi(latency=latency)
+    store = SheetStore(make_worksheet(annonces, api=api))
+    record("load_get_all_records", store.load, api)
+    record("load_cache", lambda: AnnonceCache().refresh(store), api)
+
+    cache = AnnonceCache()
+    cache.refresh(store)
+    records = cache.records
+    record("sort_index", lambda: ExpiryIndex(records))
+    record("index_and_filter", lambda: ExpiryIndex(records).pop_expired((today_iso, now_time)))
+
+    index = ExpiryIndex(records)
+    index.pop_expired((today_iso, now_time))
+    active = index.active()
+    record("filter_steady_state", lambda: index.pop_expired((today_iso, now_time)))
+    record("status_table", lambda: status_table(active))
+
+    table = status_table(active)
+    record("render_page", lambda: "\n\n".join(
+        reminder_card_markdown(row) for row in table.iloc[:page_size].itertuples(index=False)))
+
+    # Recherche : chargement complet avec descriptions (une lecture de colonne en plus), puis requêtes
+    def load_cache_with_details():
+        search_cache = AnnonceCache()
+        search_cache.refresh(store)
+        search_cache.load_search_details(store)
+
+    record("load_cache_with_details", load_cache_with_details, api)
+    cache.load_search_details(store)
+    record("search_text", lambda: cache.search(text="evenement 12"))
+    record("search_paroisse_text", lambda: cache.search(text="description", paroisse="Paroisse 3"))
+
+    batch = generate_annonces(100, seed=seed + 1)
+    # Détection des doublons avant écriture : recherche par clé, indépendante de la taille de la feuille
+    record("duplicate_check_100", lambda: cache.find_duplicates(batch))
+    append_api = FakeApi(latency=latency, rate_limit=rate_limit)
+    append_store = SheetStore(make_worksheet([], api=append_api))
+
+    def append_one_by_one():
+        for annonce in batch:
+            try:
+                append_store.append(annonce)
+            except FakeAPIError:
+                pass
+
+    record("append_100_single", append_one_by_one, append_api)
+    record("append_100_batch", lambda: append_store.append_many(batch), append_api)
+    results["summary"] = {"rows": size, "active": len(active)}
+    return results
+
+
+def run_writer_benchmark(count=100, latency=0.0, rate_limit=None):
+    """Temps de soumission (côté formulaire) et temps jusqu'à écriture complète via AnnonceWriter."""
+    api = FakeApi(latency=latency, rate_limit=rate_limit)
+    store = SheetStore(make_worksheet([], api=api))
+    journal_dir = tempfile.TemporaryDirectory()
+    journal_path = os.path.join(journal_dir.name, "journal.jsonl")
+    writer = AnnonceWriter(lambda: store, journal_path, min_interval=0.01, max_backoff=1.0).start()
+    try:
+        start = time.perf_counter()
+        for annonce in generate_annonces(count, seed=42):
+            writer.submit(annonce)
+        submitted = time.perf_counter() - start
+        writer.flush(timeout=120)
+        drained = time.perf_counter() - start
+    finally:
+        writer.stop(timeout=1)
+        journal_dir.cleanup()
+    return {"submit_seconds": submitted, "drain_seconds": drained, "api_calls": api.calls}
+
+
+def run_sources_benchmark(sources=4, size=1000, latency=0.0):
+    """Chargement de plusieurs sources : une après l'autre, puis en parallèle sur un pool partagé."""
+    apis = [FakeApi(latency=latency) for _ in range(sources)]
+    stores = [SheetStore(make_worksheet(generate_annonces(size, seed=seed), api=api))
+              for seed, api in enumerate(apis)]
+
+    start = time.perf_counter()
+    for store in stores:
+        AnnonceCache().refresh(store)
+    sequential = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=sources) as pool:
+        caches = [AnnonceCache() for _ in stores]
+        for cache, store in zip(caches, stores):
+            cache.refresh_in_background(lambda store=store: store, lambda store, cache=cache: cache.refresh(store),
+                                        executor=pool)
+        for cache in caches:
+            cache.wait_background_refresh()
+    parallel = time.perf_counter() - start
+    return {"sources": sources, "sequential_seconds": sequential, "parallel_seconds": parallel,
+            "api_calls": sum(api.calls for api in apis)}
+
+
+def _format_bytes(count):
+    for unit in ("o", "Ko", "Mo", "Go"):
+        if count < 1024:
+            return f"{count:.0f} {unit}"
+        count /= 1024
+    return f"{count:.1f} To"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--latency", type=float, default=0.0, help="latence simulée par appel API (s)")
+    parser.add_argument("--rate-limit", type=int, default=None, help="appels API autorisés par minute")
+    parser.add_argument("--page-size", type=int, default=25)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="fichier de sortie JSON (suivi des régressions)")
+    args = parser.parse_args(argv)
+
+    report = {}
+    for size in args.sizes:
+        results = run_benchmarks(size, args.latency, args.rate_limit, args.page_size, args.seed)
+        report[size] = results
+        print(f"\n=== {size} annonces ({results['summary']['active']} actives) ===")
+        for stage, result in results.items():
+            if stage == "summary":
+                continue
+            print(f"{stage:<24} {result['seconds'] * 1000:>10.2f} ms  {_format_bytes(result['peak_bytes']):>10}"
+                  f"  {result['api_calls']:>5} appel(s) API")
+
+    writer_result = run_writer_benchmark(latency=args.latency, rate_limit=args.rate_limit)
+    report["writer"] = writer_result
+    print(f"\nAnnonceWriter (100 annonces) : soumission {writer_result['submit_seconds'] * 1000:.2f} ms, "
+          f"écriture complète {writer_result['drain_seconds'] * 1000:.2f} ms, {writer_result['api_calls']} appel(s) API")
+
+    sources_result = run_sources_benchmark(latency=args.latency)
+    report["sources"] = sources_result
+    print(f"Chargement de {sources_result['sources']} sources : une à une "
+          f"{sources_result['sequential_seconds'] * 1000:.2f} ms, en parallèle "
+          f"{sources_result['parallel_seconds'] * 1000:.2f} ms")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as output:
+            json.dump(report, output, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,303 @@
+"""
+Génération hors navigateur des résumés de rappels, par paroisse, pour les N prochains jours.
+
+    python digest.py --days 7 --output digests
+    python digest.py --sheet "Annonces Diocèse A" --sheet "Annonces Diocèse B" --formats html ics
+    python digest.py --sqlite annonces.db --workers 4
+
+Réutilise la logique de l'application (expiration, occurrences des séries récurrentes, statuts)
+et traite plusieurs sources en parallèle ; l'échec d'une source n'empêche pas les autres.
+Conçu pour être lancé périodiquement (cron, tâche planifiée...).
+"""
+import argparse
+import hashlib
+import html
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import tomllib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+from annonces import expand_recurrences, status_table
+from search import slugify
+from storage import AnnonceCache, SheetStore, SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("html", "json", "ics")
+
+
+# --- Sources ---
+
+def load_secrets(path):
+    """Lit le fichier secrets.toml de l'application (sections gcp_service_account, google_sheets)."""
+    if not os.path.exists(path):
+        return {}
+    with open(path, "rb") as secrets_file:
+        return tomllib.load(secrets_file)
+
+
+def shared_gspread_client(secrets, pool_size=10):
+    """
+    Fabrique du client gspread, créé au premier besoin puis partagé par toutes les feuilles
+    (une seule authentification, une seule session HTTP dont le pool suffit aux sources parallèles).
+    """
+    lock = threading.Lock()
+    clients = []
+
+    def get_client():
+        with lock:
+            if not clients:
+                import gspread
+                from requests.adapters import HTTPAdapter
+
+                credentials = dict(secrets["gcp_service_account"])
+                credentials["private_key"] = credentials["private_key"].replace('\\n', '\n')
+                gc = gspread.service_account_from_dict(credentials)
+                gc.http_client.session.mount(
+                    "https://", HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size))
+                clients.append(gc)
+            return clients[0]
+
+    return get_client
+
+
+def sheet_source(sheet_name, get_client, worksheet="annonce", name=None):
+    """Fabrique d'un SheetStore pour une Google Sheet (client partagé fourni par get_client)."""
+    def open_store():
+        return SheetStore(get_client().open(sheet_name).worksheet(worksheet))
+
+    return name or sheet_name, open_store
+
+
+def sqlite_source(path, name=None):
+    """Fabrique d'un SQLiteStore (la base doit exister : pas de base vide créée par erreur)."""
+    def open_store():
+        if not os.path.exists(path):
+            raise FileNotFoundError(path)
+        return SQLiteStore(path)
+
+    return name or os.path.basename(path), open_store
+
+
+# --- Calcul des rappels ---
+
+def upcoming_reminders(store, days, today=None, now_time=None):
+    """
+    Rappels actifs de [today, today + days] : mêmes étapes que filter_and_cleanup_annonces
+    (chargement, retrait des expirées, occurrences des séries) puis statuts de l'onglet Rappels.
+    """
+    today = today or date.today()
+    now = (today.isoformat(), now_time or datetime.now().strftime("%H:%M"))
+    window_end = today + timedelta(days=days)
+
+    cache = AnnonceCache()
+    cache.refresh(store, date_min=today.isoformat())
+    cache.pop_expired(*now)
+    annonces = expand_recurrences(cache.search(date_min=today, date_max=window_end), today, window_end, now)
+
+    # Descriptions lues en une fois pour les seules annonces retenues (séries comprises)
+    store.load_all_details(list({id(a.serie or a): a.serie or a for a in annonces}.values()))
+    reminders = status_table(annonces, today)
+    return reminders.assign(
+        description=[(a.serie or a).get('evenement_description', 'Pas de description') for a in annonces])
+
+
+def _reminder_dict(row):
+    annonce = row.annonce
+    return {
+        "type": (annonce.serie or annonce).get('type'),
+        "paroisse": row.paroisse,
+        "titre": row.titre,
+        "description": row.description,
+        "debut": annonce.debut.isoformat() if annonce.debut else None,
+        "fin": annonce.fin.isoformat() if annonce.fin else None,
+        "heure": row.heure,
+        "status": row.status,
+        "status_text": row.status_text,
+        "caption": row.caption,
+    }
+
+
+# --- Formats de sortie ---
+
+def _markdown_to_html(text):
+    return re.sub(r"\*\*(.+?)\*\*", r"<b>\1</b>", html.escape(str(text)))
+
+
+def render_html(paroisse, reminders, today, days):
+    cards = "\n".join(
+        f"<div class=\"rappel\" style=\"border-left: 4px solid {row.color}; padding: 4px 12px; margin: 12px 0;\">\n"
+        f"  <h3>{html.escape(row.titre)}</h3>\n"
+        f"  <p>{html.escape(str(row.description))}</p>\n"
+        f"  <p><small>{_markdown_to_html(row.caption)}</small></p>\n"
+        f"  <p style=\"color: {row.color};\"><b>{_markdown_to_html(row.status_text)}</b></p>\n"
+        "</div>"
+        for row in reminders.itertuples(index=False)
+    )
+    return (
+        "<!DOCTYPE html>\n<html lang=\"fr\">\n<head><meta charset=\"utf-8\">"
+        f"<title>Rappels - {html.escape(paroisse)}</title></head>\n<body>\n"
+        f"<h1>⛪ {html.escape(paroisse)}</h1>\n"
+        f"<p>Événements du {today.strftime('%d/%m/%Y')} au "
+        f"{(today + timedelta(days=days)).strftime('%d/%m/%Y')} ({len(reminders)})</p>\n"
+        f"{cards}\n</body>\n</html>\n"
+    )
+
+
+def render_json(paroisse, reminders, today, days):
+    return json.dumps({
+        "paroisse": paroisse,
+        "date_debut": today.isoformat(),
+        "date_fin": (today + timedelta(days=days)).isoformat(),
+        "rappels": [_reminder_dict(row) for row in reminders.itertuples(index=False)],
+    }, ensure_ascii=False, indent=2)
+
+
+def _escape_ics(value):
+    return (str(value).replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+            .replace("\r\n", "\\n").replace("\n", "\\n"))
+
+
+def _fold_ics(line):
+    """Lignes de 75 octets au plus (RFC 5545), continuées par un espace."""
+    encoded = line.encode("utf-8")
+    parts = []
+    while len(encoded) > 75:
+        cut = 75 if not parts else 74
+        while cut and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(encoded[:cut].decode("utf-8"))
+        encoded = encoded[cut:]
+    parts.append(encoded.decode("utf-8"))
+    return "\r\n ".join(parts)
+
+
+def render_ics(paroisse, reminders, today, days):
+    """Calendrier relisible par l'import groupé (LOCATION = paroisse)."""
+    stamp = datetime.now().strftime("%Y%m%dT%H%M%S")
+    lines = ["BEGIN:VCALENDAR", "VERSION:2.0", "PRODID:-//affiche-renouveau//rappels//FR"]
+    for row in reminders.itertuples(index=False):
+        annonce = row.annonce
+        if annonce.debut is None:
+            continue
+        uid = hashlib.sha1(f"{row.paroisse}|{row.titre}|{annonce.debut}|{row.heure}".encode("utf-8")).hexdigest()
+        lines += ["BEGIN:VEVENT", f"UID:{uid}@affiche-renouveau", f"DTSTAMP:{stamp}"]
+        if annonce.type == 'periode' or annonce.heure is None:
+            lines += [f"DTSTART;VALUE=DATE:{annonce.debut.strftime('%Y%m%d')}",
+                      f"DTEND;VALUE=DATE:{(annonce.fin + timedelta(days=1)).strftime('%Y%m%d')}"]
+        else:
+            lines.append(f"DTSTART:{datetime.combine(annonce.debut, annonce.heure).strftime('%Y%m%dT%H%M%S')}")
+        lines += [
+            f"SUMMARY:{_escape_ics(row.titre)}",
+            f"DESCRIPTION:{_escape_ics(row.description)}",
+            f"LOCATION:{_escape_ics(row.paroisse)}",
+            "END:VEVENT",
+        ]
+    lines.append("END:VCALENDAR")
+    return "\r\n".join(_fold_ics(line) for line in lines) + "\r\n"
+
+
+RENDERERS = {"html": render_html, "json": render_json, "ics": render_ics}
+
+
+# --- Écriture des résumés ---
+
+def write_digests(name, reminders, output_dir, formats, today, days):
+    """Écrit un fichier par paroisse et par format dans output_dir/<source>/. Retourne les chemins écrits."""
+    source_dir = os.path.join(output_dir, slugify(name))
+    os.makedirs(source_dir, exist_ok=True)
+    written = []
+    for paroisse, group in reminders.groupby("paroisse", sort=True):
+        for fmt in formats:
+            path = os.path.join(source_dir, f"{slugify(paroisse)}.{fmt}")
+            # Écriture atomique : un lecteur ne voit jamais un fichier à moitié écrit
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8", newline="") as digest_file:
+                digest_file.write(RENDERERS[fmt](paroisse, group, today, days))
+            os.replace(tmp_path, path)
+            written.append(path)
+
+    # Paroisses sans rappel sur la période : leurs anciens résumés sont retirés
+    for file_name in os.listdir(source_dir):
+        path = os.path.join(source_dir, file_name)
+        if file_name.rpartition(".")[2] in formats and path not in written:
+            os.remove(path)
+    return written
+
+
+def process_source(name, store_factory, output_dir, formats, days, today=None):
+    """Calcule et écrit les résumés d'une source. Retourne le nombre de fichiers écrits."""
+    today = today or date.today()
+    store = store_factory()
+    reminders = upcoming_reminders(store, days, today)
+    written = write_digests(name, reminders, output_dir, formats, today, days)
+    logger.info("%s : %d rappel(s), %d fichier(s) écrit(s)", name, len(reminders), len(written))
+    return len(written)
+
+
+def run(sources, output_dir, formats=FORMATS, days=7, workers=4):
+    """Traite les sources en parallèle. Retourne {source: nombre de fichiers ou exception}."""
+    results = {}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {name: pool.submit(process_source, name, factory, output_dir, formats, days)
+                   for name, factory in sources}
+        for name, future in futures.items():
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                # Une source en échec (droits, quota, réseau...) n'empêche pas les autres
+                logger.error("%s : échec de la génération des résumés (%s)", name, e)
+                results[name] = e
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--secrets", default=os.path.join(".streamlit", "secrets.toml"),
+                        help="secrets de l'application (compte de service, nom de la feuille)")
+    parser.add_argument("--sheet", action="append", default=[], help="Google Sheet à traiter (répétable)")
+    parser.add_argument("--worksheet", default="annonce")
+    parser.add_argument("--sqlite", action="append", default=[], help="base SQLite à traiter (répétable)")
+    parser.add_argument("--days", type=int, default=7, help="horizon des rappels, en jours")
+    parser.add_argument("--output", default="digests", help="dossier de sortie")
+    parser.add_argument("--formats", nargs="+", choices=FORMATS, default=list(FORMATS))
+    parser.add_argument("--workers", type=int, default=4, help="sources traitées en parallèle")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+
+    secrets = load_secrets(args.secrets)
+    sheets = [(sheet_name, args.worksheet, None) for sheet_name in args.sheet]
+    databases = [(path, None) for path in args.sqlite]
+    if not sheets and not databases:
+        # Mêmes sources que l'application ([[storage.sources]], sinon la source unique historique)
+        storage = secrets.get("storage", {})
+        configured = storage.get("sources", [])
+        if storage.get("backend") == "sqlite":
+            databases = ([(source["sqlite_path"], source.get("name")) for source in configured]
+                         or [(storage.get("sqlite_path", "annonces.db"), None)])
+        else:
+            sheets = [(source["sheet_name"], source.get("worksheet", "annonce"), source.get("name"))
+                      for source in configured]
+            if not sheets and secrets.get("google_sheets", {}).get("sheet_name"):
+                sheets = [(secrets["google_sheets"]["sheet_name"], "annonce", None)]
+
+    sources = [sqlite_source(path, name) for path, name in databases]
+    if sheets:
+        if "gcp_service_account" not in secrets:
+            parser.error(f"section [gcp_service_account] introuvable dans {args.secrets}")
+        get_client = shared_gspread_client(secrets, pool_size=max(10, args.workers * 2))
+        sources += [sheet_source(sheet_name, get_client, worksheet, name) for sheet_name, worksheet, name in sheets]
+    if not sources:
+        parser.error("aucune source : utilisez --sheet, --sqlite ou un fichier secrets configuré")
+
+    results = run(sources, args.output, args.formats, args.days, args.workers)
+    return 1 if any(isinstance(result, Exception) for result in results.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
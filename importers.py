@@ -0,0 +1,209 @@
+"""Import groupé d'annonces depuis un fichier CSV ou iCalendar (.ics), avec validation complète."""
+import csv
+import io
+import re
+from datetime import date, datetime, timedelta
+
+from annonces import COLUMN_HEADERS, format_recurrence, parse_recurrence
+
+DEFAULT_HEURE = "10:00"
+
+REQUIRED_FIELDS_MESSAGE = "Veuillez remplir tous les champs obligatoires (Paroisse, Titre et Description)."
+DATE_ORDER_MESSAGE = "La date de fin ne peut pas être antérieure à la date de début."
+
+
+class ImportErrorLine:
+    """Erreur de validation d'une ligne (ou d'un VEVENT) du fichier importé."""
+
+    __slots__ = ("line", "titre", "message")
+
+    def __init__(self, line, titre, message):
+        self.line = line
+        self.titre = titre
+        self.message = message
+
+    def to_dict(self):
+        return {"ligne": self.line, "titre": self.titre, "erreur": self.message}
+
+
+def _parse_date(value):
+    """Date ISO (AAAA-MM-JJ), française (JJ/MM/AAAA) ou iCalendar (AAAAMMJJ) -> date ISO, ou None."""
+    value = (value or "").strip()
+    if not value:
+        return None
+    for fmt in ("%Y-%m-%d", "%d/%m/%Y", "%Y%m%d"):
+        try:
+            return datetime.strptime(value, fmt).date().isoformat()
+        except ValueError:
+            continue
+    raise ValueError(f"Date invalide : '{value}'")
+
+
+def _parse_heure(value):
+    """Heure "H:MM", "HH:MM" ou "HH:MM:SS" -> "HH:MM" (DEFAULT_HEURE si vide)."""
+    value = (value or "").strip()
+    if not value:
+        return DEFAULT_HEURE
+    match = re.fullmatch(r"(\d{1,2})[:hH](\d{2})(?::\d{2})?", value)
+    if not match or int(match.group(1)) > 23 or int(match.group(2)) > 59:
+        raise ValueError(f"Heure invalide : '{value}'")
+    return f"{int(match.group(1)):02d}:{match.group(2)}"
+
+
+# --- Lecture des fichiers ---
+
+def read_csv(text):
+    """
+    Lit un CSV dont la première ligne contient (un sous-ensemble de) COLUMN_HEADERS.
+    Séparateur ',' ou ';' détecté automatiquement. Retourne [(numéro de ligne, dict)].
+    """
+    try:
+        dialect = csv.Sniffer().sniff(text[:4096], delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+    reader = csv.DictReader(io.StringIO(text), dialect=dialect)
+    if not reader.fieldnames or not set(reader.fieldnames) & set(COLUMN_HEADERS):
+        raise ValueError(f"En-têtes CSV attendus : {', '.join(COLUMN_HEADERS)}")
+    return [
+        (reader.line_num, {key.strip(): (value or "").strip() for key, value in row.items() if key})
+        for row in reader
+    ]
+
+
+def _unfold_ics(text):
+    """Lignes logiques d'un fichier iCalendar (les lignes commençant par un blanc prolongent la précédente)."""
+    lines = []
+    for line in text.splitlines():
+        if line[:1] in (" ", "\t") and lines:
+            lines[-1] += line[1:]
+        elif line:
+            lines.append(line)
+    return lines
+
+
+def _unescape_ics(value):
+    return value.replace("\\n", "\n").replace("\\N", "\n").replace("\\,", ",").replace("\\;", ";").replace("\\\\", "\\")
+
+
+def read_ics(text, default_paroisse=""):
+    """
+    Lit les VEVENT d'un fichier iCalendar : SUMMARY -> titre, DESCRIPTION -> description,
+    LOCATION -> paroisse (sinon default_paroisse). Un événement sur un seul jour devient 'ponctuel',
+    sur plusieurs jours 'periode', avec RRULE 'recurrent'. Retourne [(numéro de ligne, dict)].
+    """
+    events = []
+    current = None
+    for number, line in enumerate(_unfold_ics(text), start=1):
+        name, _, value = line.partition(":")
+        name, _, params = name.partition(";")
+        name = name.upper()
+        if name == "BEGIN" and value.upper() == "VEVENT":
+            current = {"_line": number}
+        elif name == "END" and value.upper() == "VEVENT" and current is not None:
+            events.append(current)
+            current = None
+        elif current is not None:
+            current[name] = (_unescape_ics(value.strip()), params.upper())
+
+    rows = []
+    for event in events:
+        row = {
+            "paroisse": event.get("LOCATION", (default_paroisse, ""))[0] or default_paroisse,
+            "evenement_titre": event.get("SUMMARY", ("", ""))[0],
+            "evenement_description": event.get("DESCRIPTION", ("", ""))[0],
+        }
+        start, start_params = event.get("DTSTART", ("", ""))
+        end, end_params = event.get("DTEND", ("", ""))
+        all_day = "VALUE=DATE" in start_params or len(start) == 8
+        start_date = start[:8]
+        end_date = end[:8] if end else start_date
+        if all_day and end and end_date > start_date:
+            # DTEND d'un événement « journée entière » est exclusif
+            end_date = (datetime.strptime(end_date, "%Y%m%d") - timedelta(days=1)).strftime("%Y%m%d")
+
+        heure = "" if all_day else f"{start[9:11]}:{start[11:13]}"
+        rrule = dict(part.partition("=")[::2] for part in event.get("RRULE", ("", ""))[0].upper().split(";") if part)
+        if rrule:
+            # Série : FREQ=WEEKLY|MONTHLY et UNTIL obligatoires, EXDATE facultatif (une seule ligne EXDATE lue).
+            # Les autres parties (INTERVAL, BYDAY, COUNT...) sont conservées : la validation les refuse
+            exdates = [_parse_date(day[:8]) for day in event.get("EXDATE", ("", ""))[0].split(",") if day]
+            rule = ";".join(f"{key}={value}" for key, value in rrule.items() if key != "UNTIL")
+            row.update(type="recurrent", date_debut=start_date, date_fin=rrule.get("UNTIL", "")[:8],
+                       heure_evenement=heure, recurrence=f"{rule};EXDATE={','.join(exdates)}")
+        elif end_date and end_date != start_date:
+            row.update(type="periode", date_debut=start_date, date_fin=end_date, heure_evenement=heure)
+        else:
+            row.update(type="ponctuel", date_evenement=start_date, heure_evenement=heure)
+        rows.append((event["_line"], row))
+    return rows
+
+
+def read_file(name, content, default_paroisse=""):
+    """Lit un fichier importé (.csv ou .ics) à partir de son nom et de son contenu (bytes)."""
+    text = content.decode("utf-8-sig")
+    if name.lower().endswith(".ics"):
+        return read_ics(text, default_paroisse)
+    rows = read_csv(text)
+    if default_paroisse:
+        for _, row in rows:
+            row["paroisse"] = row.get("paroisse") or default_paroisse
+    return rows
+
+
+# --- Validation ---
+
+def validate_rows(rows, today=None):
+    """
+    Valide toutes les lignes d'un coup (mêmes règles que les formulaires).
+    Retourne (annonces valides prêtes à écrire, [ImportErrorLine]).
+    """
+    today_iso = (today or date.today()).isoformat()
+    valid, errors = [], []
+
+    for line, row in rows:
+        titre = row.get("evenement_titre", "")
+        try:
+            if not (row.get("paroisse") and titre and row.get("evenement_description")):
+                raise ValueError(REQUIRED_FIELDS_MESSAGE)
+
+            annonce_type = row.get("type") or (
+                "recurrent" if row.get("recurrence")
+                else "periode" if row.get("date_debut") or row.get("date_fin") else "ponctuel")
+            annonce = {
+                "type": annonce_type,
+                "paroisse": row["paroisse"],
+                "evenement_titre": titre,
+                "evenement_description": row["evenement_description"],
+                "heure_evenement": _parse_heure(row.get("heure_evenement")),
+                "created_at": today_iso,
+            }
+
+            if annonce_type in ("periode", "recurrent"):
+                if annonce_type == "recurrent":
+                    # Règle vérifiée d'abord : une règle refusée est signalée comme telle
+                    annonce["recurrence"] = format_recurrence(*parse_recurrence(row.get("recurrence")))
+                date_debut = _parse_date(row.get("date_debut"))
+                date_fin = _parse_date(row.get("date_fin"))
+                if not date_debut or not date_fin:
+                    raise ValueError("Dates de début et de fin obligatoires pour une période ou une série.")
+                if date_debut > date_fin:
+                    raise ValueError(DATE_ORDER_MESSAGE)
+                if date_fin < today_iso:
+                    raise ValueError("Période déjà terminée.")
+                annonce.update(date_debut=date_debut, date_fin=date_fin)
+            elif annonce_type == "ponctuel":
+                date_evenement = _parse_date(row.get("date_evenement"))
+                if not date_evenement:
+                    raise ValueError("Date de l'événement obligatoire.")
+                if date_evenement < today_iso:
+                    raise ValueError("Événement déjà passé.")
+                annonce.update(date_evenement=date_evenement)
+            else:
+                raise ValueError(f"Type inconnu : '{annonce_type}' (attendu : periode, ponctuel ou recurrent).")
+
+        except ValueError as e:
+            errors.append(ImportErrorLine(line, titre, str(e)))
+            continue
+        valid.append(annonce)
+
+    return valid, errors
@@ -0,0 +1,180 @@
+"""Instrumentation par rerun : durées par étape, appels API Google, succès/échecs de cache, percentiles."""
+import json
+import logging
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from contextlib import contextmanager
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Chaque rerun Streamlit s'exécute dans un seul thread : les mesures en cours sont locales au thread
+_current = threading.local()
+
+# Entrée d'un rerun complet ; les autres (fragment relancé seul, synchronisation en arrière-plan)
+# sont enregistrées à part, avec leur propre "kind"
+RERUN = "rerun"
+
+
+class RerunMetrics:
+    """Mesures d'un rerun : durée cumulée par étape et compteurs (appels API, cache...)."""
+
+    def __init__(self, kind=RERUN):
+        self.kind = kind
+        self.started_at = datetime.now()
+        self.stages = defaultdict(float)
+        self.counters = Counter()
+        self.total = None
+        self._start = time.perf_counter()
+
+    def finish(self):
+        self.total = time.perf_counter() - self._start
+        return self
+
+    def to_dict(self):
+        return {
+            "kind": self.kind,
+            "started_at": self.started_at.isoformat(timespec="milliseconds"),
+            "total": self.total,
+            "stages": dict(self.stages),
+            "counters": dict(self.counters),
+        }
+
+
+def begin_rerun(kind=RERUN):
+    """Démarre les mesures du rerun courant."""
+    _current.metrics = RerunMetrics(kind)
+    return _current.metrics
+
+
+def current():
+    """Mesures du rerun courant, ou None hors d'un rerun instrumenté (thread d'écriture...)."""
+    return getattr(_current, "metrics", None)
+
+
+@contextmanager
+def recording(recorder, kind):
+    """
+    Mesure un bloc comme une entrée à part, enregistrée à la sortie (même en cas d'erreur).
+    Sert aux synchronisations lancées sur le pool de chargement, hors de tout rerun.
+    """
+    previous = current()
+    metrics = begin_rerun(kind)
+    try:
+        yield metrics
+    finally:
+        _current.metrics = previous
+        recorder.record(metrics)
+
+
+@contextmanager
+def fragment_run(recorder, name):
+    """
+    Mesures d'un fragment Streamlit : ajoutées au rerun complet en cours, ou enregistrées comme
+    une entrée "fragment:<name>" quand le fragment est relancé seul (le haut et le bas du script,
+    qui démarrent et enregistrent le rerun, ne sont alors pas exécutés).
+    """
+    metrics = current()
+    if metrics is not None and metrics.total is None:
+        yield metrics
+        return
+    with recording(recorder, f"fragment:{name}") as metrics:
+        yield metrics
+
+
+@contextmanager
+def stage(name):
+    """Chronomètre une étape du rerun courant (les durées d'une même étape s'additionnent)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics = current()
+        if metrics is not None:
+            metrics.stages[name] += time.perf_counter() - start
+
+
+def count(name, n=1):
+    """Incrémente un compteur du rerun courant."""
+    metrics = current()
+    if metrics is not None:
+        metrics.counters[name] += n
+
+
+class CountingProxy:
+    """Enveloppe un objet gspread et compte chacun de ses appels de méthode comme un appel API."""
+
+    def __init__(self, target, counter="api_calls"):
+        self._target = target
+        self._counter = counter
+
+    def __getattr__(self, name):
+        attribute = getattr(self._target, name)
+        if not callable(attribute):
+            return attribute
+
+        def counted(*args, **kwargs):
+            count(self._counter)
+            return attribute(*args, **kwargs)
+
+        return counted
+
+
+def percentile(values, q):
+    """Percentile q (0-100) par interpolation linéaire."""
+    values = sorted(values)
+    if not values:
+        return None
+    position = (len(values) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+class MetricsRecorder:
+    """Historique des N derniers reruns du processus, avec export JSON lines optionnel."""
+
+    def __init__(self, history=200, log_path=None):
+        self.log_path = log_path
+        self._history = deque(maxlen=history)
+        self._lock = threading.Lock()
+
+    def record(self, metrics):
+        """Clôt et enregistre les mesures d'un rerun."""
+        entry = metrics.finish().to_dict()
+        with self._lock:
+            self._history.append(entry)
+            line = json.dumps(entry, ensure_ascii=False)
+            if self.log_path:
+                with open(self.log_path, "a", encoding="utf-8") as log_file:
+                    log_file.write(line + "\n")
+        logger.debug("rerun %s", line)
+        return entry
+
+    def history(self):
+        with self._lock:
+            return list(self._history)
+
+    def summary(self):
+        """
+        {étape: {"n", "p50", "p95", "max"}} sur l'historique (durées en secondes) ; "total" pour les
+        reruns complets, "total <kind>" pour les fragments relancés seuls et les synchronisations.
+        """
+        samples = defaultdict(list)
+        for entry in self.history():
+            kind = entry.get("kind", RERUN)
+            samples["total" if kind == RERUN else f"total {kind}"].append(entry["total"])
+            for name, seconds in entry["stages"].items():
+                samples[name].append(seconds)
+        return {
+            name: {"n": len(values), "p50": percentile(values, 50), "p95": percentile(values, 95), "max": max(values)}
+            for name, values in samples.items()
+        }
+
+    def counter_totals(self):
+        """Somme des compteurs sur l'historique (appels API, succès/échecs de cache...)."""
+        totals = Counter()
+        for entry in self.history():
+            totals.update(entry["counters"])
+        return dict(totals)
@@ -0,0 +1,204 @@
+"""
+Index de recherche en mémoire : index inversé plein texte (titre, description), paroisse, type
+et clé de doublon.
+"""
+import bisect
+import itertools
+import re
+import unicodedata
+from collections import defaultdict
+from operator import itemgetter
+
+from annonces import start_key
+
+_WORD = re.compile(r"\w+")
+
+
+def tokenize(text):
+    """Mots en minuscules et sans accents ("Fête-Dieu" -> ["fete", "dieu"])."""
+    text = str(text or "").lower()
+    if not text.isascii():
+        text = "".join(char for char in unicodedata.normalize("NFKD", text) if not unicodedata.combining(char))
+    return _WORD.findall(text)
+
+
+def slugify(value):
+    """Nom de fichier sûr ("Paroisse Saint-Érasme" -> "paroisse-saint-erasme")."""
+    value = unicodedata.normalize("NFKD", str(value)).encode("ascii", "ignore").decode()
+    return re.sub(r"[^a-z0-9]+", "-", value.lower()).strip("-") or "sans-nom"
+
+
+def duplicate_key(annonce):
+    """
+    Clé normalisée (paroisse, titre, date, heure) de détection des doublons : casse, accents,
+    ponctuation et espaces ignorés ; date de début pour une période ou une série.
+    """
+    if annonce.get('type') in ('periode', 'recurrent'):
+        day = annonce.get('date_debut', '')
+    else:
+        day = annonce.get('date_evenement', '')
+    heure = annonce.heure.strftime("%H:%M") if annonce.heure else str(annonce.get('heure_evenement', ''))
+    return (" ".join(tokenize(annonce.get('paroisse'))), " ".join(tokenize(annonce.get('evenement_titre'))),
+            str(day), heure)
+
+
+class SearchIndex:
+    """
+    Index inversé mot -> annonces sur evenement_titre et evenement_description, et tables
+    paroisse -> annonces, type -> annonces et clé de doublon -> annonces. Mis à jour annonce par
+    annonce (ajout, retrait, description chargée) : une recherche ne relit jamais toutes les annonces.
+    """
+
+    def __init__(self, annonces=()):
+        self._seq = itertools.count()
+        # id(annonce) -> ((date de début, ordre d'insertion), annonce) ; les annonces ne sont pas hachables
+        self._records = {}
+        self._tokens = {}
+        self._postings = {}
+        self._paroisses = defaultdict(set)
+        self._types = defaultdict(set)
+        self._duplicates = defaultdict(set)
+        # Annonces dont la description n'est pas encore chargée (lecture projetée)
+        self._missing = set()
+        # Vocabulaire trié (recherche par préfixe), reconstruit à la demande après modification
+        self._vocabulary = None
+        self.extend(annonces)
+
+    def __len__(self):
+        return len(self._records)
+
+    def add(self, annonce):
+        key = id(annonce)
+        if key in self._records:
+            return
+        self._records[key] = ((start_key(annonce), next(self._seq)), annonce)
+        self._paroisses[annonce.get('paroisse', '')].add(key)
+        self._types[annonce.get('type', 'ponctuel')].add(key)
+        self._duplicates[duplicate_key(annonce)].add(key)
+        self._index_text(key, annonce)
+
+    def extend(self, annonces):
+        for annonce in annonces:
+            self.add(annonce)
+
+    def _index_text(self, key, annonce):
+        if annonce.evenement_description is None:
+            self._missing.add(key)
+        else:
+            self._missing.discard(key)
+        tokens = tuple(set(tokenize(annonce.get('evenement_titre')) + tokenize(annonce.get('evenement_description'))))
+        self._tokens[key] = tokens
+        for token in tokens:
+            postings = self._postings.get(token)
+            if postings is None:
+                # Mot présent dans une seule annonce (cas le plus fréquent) : la clé seule, sans ensemble
+                self._postings[token] = key
+                self._vocabulary = None
+            elif isinstance(postings, set):
+                postings.add(key)
+            elif postings != key:
+                self._postings[token] = {postings, key}
+
+    def _unindex_text(self, key):
+        for token in self._tokens.pop(key, ()):
+            postings = self._postings[token]
+            if not isinstance(postings, set):
+                del self._postings[token]
+                self._vocabulary = None
+                continue
+            postings.discard(key)
+            if len(postings) == 1:
+                self._postings[token] = next(iter(postings))
+
+    def remove(self, annonces):
+        """Retire des annonces de l'index (expirées, évincées)."""
+        for annonce in annonces:
+            key = id(annonce)
+            if self._records.pop(key, None) is None:
+                continue
+            _discard(self._paroisses, annonce.get('paroisse', ''), key)
+            _discard(self._types, annonce.get('type', 'ponctuel'), key)
+            _discard(self._duplicates, duplicate_key(annonce), key)
+            self._missing.discard(key)
+            self._unindex_text(key)
+
+    def update(self, annonces):
+        """Réindexe le texte d'annonces modifiées (description chargée après coup)."""
+        for annonce in annonces:
+            key = id(annonce)
+            if key in self._records:
+                self._unindex_text(key)
+                self._index_text(key, annonce)
+
+    def missing_details(self):
+        """Annonces dont la description n'est pas encore chargée (lecture projetée)."""
+        return [self._records[key][1] for key in self._missing]
+
+    def find_duplicate(self, annonce):
+        """Annonce déjà indexée avec la même clé de doublon, ou None (recherche en O(1))."""
+        keys = self._duplicates.get(duplicate_key(annonce))
+        if not keys:
+            return None
+        return self._records[min(keys, key=lambda key: self._records[key][0])][1]
+
+    def paroisses(self):
+        return sorted(paroisse for paroisse in self._paroisses if paroisse)
+
+    def _matching_token_keys(self, token):
+        """Annonces contenant un mot commençant par token (le dernier mot saisi peut être incomplet)."""
+        if self._vocabulary is None:
+            self._vocabulary = sorted(self._postings)
+        keys = set()
+        position = bisect.bisect_left(self._vocabulary, token)
+        for word in itertools.islice(self._vocabulary, position, None):
+            if not word.startswith(token):
+                break
+            postings = self._postings[word]
+            if isinstance(postings, set):
+                keys |= postings
+            else:
+                keys.add(postings)
+        return keys
+
+    def search(self, text="", paroisse=None, annonce_type=None, candidates=None, ordered=None):
+        """
+        Annonces correspondant à tous les critères, triées par date de début. Tous les mots de
+        `text` doivent apparaître (en préfixe) dans le titre ou la description ; `candidates`
+        (liste triée, annonces déjà filtrées par dates) restreint le résultat. `ordered` : toutes
+        les annonces triées par date de début, pour éviter un tri quand le résultat est gros.
+        """
+        key_sets = []
+        if paroisse:
+            key_sets.append(self._paroisses.get(paroisse, set()))
+        if annonce_type:
+            key_sets.append(self._types.get(annonce_type, set()))
+        for token in set(tokenize(text)):
+            key_sets.append(self._matching_token_keys(token))
+
+        if not key_sets:
+            return list(candidates if candidates is not None else ordered or self._sorted(self._records))
+        # Intersection en partant de l'ensemble le plus petit
+        key_sets.sort(key=len)
+        keys = set(key_sets[0])
+        for key_set in key_sets[1:]:
+            keys &= key_set
+
+        # Déjà triées : un filtrage linéaire suffit (candidats, ou résultat couvrant une grande part de l'index)
+        if candidates is not None:
+            return [annonce for annonce in candidates if id(annonce) in keys]
+        if ordered is not None and len(keys) > len(ordered) // 8:
+            return [annonce for annonce in ordered if id(annonce) in keys]
+        return self._sorted(keys)
+
+    def _sorted(self, keys):
+        results = [self._records[key] for key in keys if key in self._records]
+        results.sort(key=itemgetter(0))
+        return [annonce for _, annonce in results]
+
+
+def _discard(mapping, value, key):
+    keys = mapping.get(value)
+    if keys is not None:
+        keys.discard(key)
+        if not keys:
+            del mapping[value]
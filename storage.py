@@ -0,0 +1,640 @@
+"""Backends de stockage des annonces : Google Sheets (gspread) ou SQLite local."""
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, wait
+from contextlib import nullcontext
+
+from annonces import COLUMN_HEADERS, Annonce, ExpiryIndex
+from search import SearchIndex, duplicate_key
+
+ARCHIVE_WORKSHEET = "archive"
+
+# Colonnes lues au chargement ; les descriptions ne sont lues que pour les annonces affichées
+LAZY_COLUMNS = ["evenement_description"]
+PROJECTED_COLUMNS = [header for header in COLUMN_HEADERS if header not in LAZY_COLUMNS]
+
+# Cache (id classeur, id onglet) -> en-têtes de la ligne 1
+_HEADERS = {}
+
+# Types bornés par date_debut / date_fin (les autres par date_evenement), en syntaxe SQL
+SPAN_TYPES = "('periode', 'recurrent')"
+
+
+def column_letter(index):
+    """Lettre de colonne A1 d'un index 1-based (1 -> A, 27 -> AA)."""
+    letters = ""
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(ord('A') + remainder) + letters
+    return letters
+
+
+def annonce_bounds(annonce):
+    """Retourne les dates ISO (début, fin) d'une annonce selon son type (série récurrente : première date, date limite)."""
+    if annonce.get('type') in ('periode', 'recurrent'):
+        return annonce.get('date_debut'), annonce.get('date_fin')
+    date_evt = annonce.get('date_evenement')
+    return date_evt, date_evt
+
+
+def annonce_matches(annonce, date_min=None, date_max=None, paroisse=None):
+    """Vrai si l'annonce chevauche l'intervalle [date_min, date_max] et appartient à la paroisse."""
+    if paroisse is not None and annonce.get('paroisse') != paroisse:
+        return False
+    debut, fin = annonce_bounds(annonce)
+    if date_min is not None and (not fin or fin < date_min):
+        return False
+    if date_max is not None and (not debut or debut > date_max):
+        return False
+    return True
+
+
+def annonce_to_row(annonce):
+    """Construit une liste de valeurs dans l'ordre des entêtes."""
+    return [annonce.get(header, "") for header in COLUMN_HEADERS]
+
+
+class AnnonceStore:
+    """Interface commune des backends : chargement, ajout, requête et archivage."""
+
+    def load(self):
+        """Retourne toutes les annonces (liste de dicts indexés par COLUMN_HEADERS)."""
+        raise NotImplementedError
+
+    def load_since(self, cursor, date_min=None):
+        """
+        Lecture incrémentale : retourne (annonces, nouveau_curseur).
+        Si cursor > 0, la première annonce retournée est la dernière déjà connue (ancre de contrôle).
+        date_min (date ISO) : au premier chargement (cursor == 0), les backends indexés peuvent omettre
+        les annonces terminées avant cette date ; les autres retournent tout.
+        """
+        records = self.load()
+        return records[max(cursor - 1, 0):], len(records)
+
+    def append(self, annonce):
+        """Ajoute une annonce à la fin du stockage."""
+        self.append_many([annonce])
+
+    def append_many(self, annonces):
+        """Ajoute plusieurs annonces en une seule opération."""
+        raise NotImplementedError
+
+    def query(self, date_min=None, date_max=None, paroisse=None):
+        """Retourne les annonces qui chevauchent [date_min, date_max] (dates ISO), filtrées par paroisse."""
+        return [a for a in self.load() if annonce_matches(a, date_min, date_max, paroisse)]
+
+    def load_details(self, annonces):
+        """Complète les colonnes non chargées des annonces à afficher. Retourne False si incohérence."""
+        return True
+
+    def load_all_details(self, annonces):
+        """Comme load_details, pour un grand nombre d'annonces (index de recherche). Retourne False si incohérence."""
+        return self.load_details(annonces)
+
+    def archive(self, before, batch_size=500):
+        """
+        Déplace les annonces terminées avant `before` (date ISO) vers l'archive, par lots de
+        batch_size lignes. Retourne le nombre d'annonces déplacées.
+        """
+        raise NotImplementedError
+
+
+class SheetStore(AnnonceStore):
+    """Stockage dans une feuille gspread (onglet "annonce")."""
+
+    def __init__(self, worksheet, archive_title=ARCHIVE_WORKSHEET):
+        self.worksheet = worksheet
+        self.archive_title = archive_title
+
+    def load(self):
+        return self.worksheet.get_all_records(head=1, empty2zero=False)
+
+    def _headers(self, refresh=False):
+        """En-têtes de la feuille (ligne 1), lus une fois par feuille et par processus."""
+        key = (getattr(self.worksheet.spreadsheet, "id", None), self.worksheet.id)
+        if refresh or key not in _HEADERS:
+            _HEADERS[key] = self.worksheet.row_values(1)
+        return _HEADERS[key]
+
+    def load_since(self, cursor, date_min=None):
+        # Curseur = nombre de lignes de données déjà lues ; la ligne 1 contient les en-têtes.
+        # Lecture projetée : une plage par colonne utile (sans les descriptions), en un seul batch_get.
+        columns = {header: column_letter(i + 1) for i, header in enumerate(self._headers(refresh=cursor == 0))}
+        projected = [header for header in PROJECTED_COLUMNS if header in columns]
+        first_row = max(cursor + 1, 2)
+        values = self.worksheet.batch_get(
+            [f"{columns[header]}{first_row}:{columns[header]}" for header in projected],
+            major_dimension="COLUMNS",
+        )
+        records = Annonce.from_columns(
+            {header: (value_range[0] if value_range else []) for header, value_range in zip(projected, values)},
+            first_row=first_row,
+        )
+        return records, first_row - 2 + len(records)
+
+    def load_details(self, annonces):
+        """
+        Charge les colonnes non projetées (description) des seules annonces affichées, en un appel.
+        Retourne False si une ligne ne correspond plus à son annonce (feuille modifiée entre-temps).
+        """
+        missing = [a for a in annonces if a.row and a.evenement_description is None]
+        if not missing:
+            return True
+
+        headers = self._headers()
+        rows = self.worksheet.batch_get([f"{a.row}:{a.row}" for a in missing])
+        consistent = True
+        for annonce, value_range in zip(missing, rows):
+            row = dict(zip(headers, value_range[0])) if value_range else {}
+            if str(row.get("evenement_titre", "")) != str(annonce.evenement_titre or ""):
+                consistent = False
+                continue
+            annonce.evenement_description = row.get("evenement_description", "")
+        return consistent
+
+    def load_all_details(self, annonces):
+        """
+        Charge les descriptions manquantes colonne par colonne (titre et description, sur les seules
+        lignes concernées) en un appel, au lieu d'une plage par ligne.
+        """
+        missing = [a for a in annonces if a.row and a.evenement_description is None]
+        if not missing:
+            return True
+
+        columns = {header: column_letter(i + 1) for i, header in enumerate(self._headers())}
+        if "evenement_description" not in columns:
+            for annonce in missing:
+                annonce.evenement_description = ""
+            return True
+        first_row = min(a.row for a in missing)
+        last_row = max(a.row for a in missing)
+        titres, descriptions = (
+            value_range[0] if value_range else []
+            for value_range in self.worksheet.batch_get(
+                [f"{columns[header]}{first_row}:{columns[header]}{last_row}"
+                 for header in ("evenement_titre", "evenement_description")],
+                major_dimension="COLUMNS",
+            )
+        )
+        consistent = True
+        for annonce in missing:
+            i = annonce.row - first_row
+            titre = titres[i] if i < len(titres) else ""
+            if str(titre) != str(annonce.evenement_titre or ""):
+                consistent = False
+                continue
+            annonce.evenement_description = descriptions[i] if i < len(descriptions) else ""
+        return consistent
+
+    def _ensure_headers(self):
+        """
+        Feuille créée avant l'ajout d'une colonne (recurrence...) : complète la ligne d'en-têtes
+        pour que les valeurs ajoutées en fin de ligne soient relues.
+        """
+        headers = self._headers()
+        if len(headers) < len(COLUMN_HEADERS) and headers == COLUMN_HEADERS[:len(headers)]:
+            self.worksheet.update(range_name="A1", values=[COLUMN_HEADERS])
+            self._headers(refresh=True)
+
+    def append_many(self, annonces):
+        rows = [annonce_to_row(annonce) for annonce in annonces]
+        if any(annonce.get('recurrence') for annonce in annonces):
+            self._ensure_headers()
+        if rows:
+            self.worksheet.append_rows(rows, value_input_option='USER_ENTERED')
+
+    def _archive_worksheet(self):
+        from gspread.exceptions import WorksheetNotFound
+
+        spreadsheet = self.worksheet.spreadsheet
+        try:
+            return spreadsheet.worksheet(self.archive_title)
+        except WorksheetNotFound:
+            archive_ws = spreadsheet.add_worksheet(self.archive_title, rows=1, cols=len(COLUMN_HEADERS))
+            archive_ws.append_row(COLUMN_HEADERS)
+            return archive_ws
+
+    def archive(self, before, batch_size=500):
+        # Un seul archivage à la fois dans le processus
+        with _SHEET_ARCHIVE_LOCK:
+            values = self.worksheet.get_all_values()
+            if len(values) < 2:
+                return 0
+            headers, rows = values[0], values[1:]
+
+            # Ligne 1 = en-têtes, la première annonce est donc en ligne 2
+            expired_rows = [
+                i + 2 for i, row in enumerate(rows)
+                if not annonce_matches(dict(zip(headers, row)), date_min=before)
+            ]
+            if not expired_rows:
+                return 0
+
+            archive_ws = self._archive_worksheet()
+            moved = 0
+            # Lots traités de haut en bas : l'archive reçoit les lignes dans l'ordre de la feuille.
+            # Chaque lot supprimé remonte les suivants d'autant de lignes (décalage `moved`) ; les
+            # ajouts concurrents arrivent en fin de feuille et ne sont jamais touchés.
+            for i in range(0, len(expired_rows), batch_size):
+                batch = expired_rows[i:i + batch_size]
+                ranges = [(start - moved, end - moved) for start, end in _contiguous_ranges(batch)]
+                expected = [_trim_row(rows[row - 2]) for row in batch]
+
+                # Vérifie que les lignes n'ont pas été déplacées entre-temps (suppression manuelle...).
+                # Limite : le verrou ne protège que ce processus ; deux processus qui archivent la même
+                # feuille au même moment peuvent, entre cette vérification et la suppression, déplacer
+                # des lignes l'un pour l'autre. Un seul archivage à la fois doit être lancé par feuille.
+                current = self.worksheet.batch_get([f"{start}:{end}" for start, end in ranges])
+                if [_trim_row(row) for value_range in current for row in value_range] != expected:
+                    break
+
+                archive_ws.append_rows(expected, value_input_option='USER_ENTERED')
+                # Plages supprimées du bas vers le haut dans la requête : aucune ne décale les suivantes
+                self.worksheet.spreadsheet.batch_update({"requests": [
+                    {"deleteDimension": {"range": {
+                        "sheetId": self.worksheet.id, "dimension": "ROWS",
+                        "startIndex": start - 1, "endIndex": end,
+                    }}}
+                    for start, end in reversed(ranges)
+                ]})
+                moved += len(batch)
+            return moved
+
+
+_SHEET_ARCHIVE_LOCK = threading.Lock()
+
+
+def _trim_row(row):
+    """Retire les cellules vides de fin de ligne (omises par l'API selon la lecture)."""
+    row = list(row)
+    while row and row[-1] == "":
+        row.pop()
+    return row
+
+
+def _contiguous_ranges(rows):
+    """Regroupe une liste triée d'indices en intervalles contigus [(début, fin), ...]."""
+    ranges = []
+    for row in rows:
+        if ranges and ranges[-1][1] == row - 1:
+            ranges[-1] = (ranges[-1][0], row)
+        else:
+            ranges.append((row, row))
+    return ranges
+
+
+class SQLiteStore(AnnonceStore):
+    """Stockage local SQLite, indexé sur date_fin, date_evenement et paroisse (sans réseau)."""
+
+    def __init__(self, path=":memory:"):
+        self.path = path
+        self._lock = threading.Lock()
+        # Streamlit exécute les sessions dans des threads différents : connexion partagée sous verrou
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._create_schema()
+
+    def _create_schema(self):
+        columns = ", ".join(f"{header} TEXT NOT NULL DEFAULT ''" for header in COLUMN_HEADERS)
+        with self._lock, self._conn:
+            for table in ("annonces", "annonces_archive"):
+                self._conn.execute(f"CREATE TABLE IF NOT EXISTS {table} (id INTEGER PRIMARY KEY, {columns})")
+                # Base créée par une version antérieure : ajoute les colonnes apparues depuis (recurrence...)
+                existing = {row["name"] for row in self._conn.execute(f"PRAGMA table_info({table})")}
+                for header in COLUMN_HEADERS:
+                    if header not in existing:
+                        self._conn.execute(f"ALTER TABLE {table} ADD COLUMN {header} TEXT NOT NULL DEFAULT ''")
+            for column in ("date_fin", "date_evenement", "paroisse"):
+                self._conn.execute(f"CREATE INDEX IF NOT EXISTS idx_annonces_{column} ON annonces ({column})")
+
+    def _select(self, where="", params=(), with_id=False):
+        columns = ", ".join((["id"] if with_id else []) + COLUMN_HEADERS)
+        sql = f"SELECT {columns} FROM annonces {where} ORDER BY id"
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(sql, params)]
+
+    def load(self):
+        return self._select()
+
+    def load_since(self, cursor, date_min=None):
+        # Curseur = dernier id lu (les id sont croissants à l'insertion)
+        if cursor == 0 and date_min is not None:
+            # Premier chargement par les index date_fin / date_evenement, sans l'historique terminé.
+            # Les lignes sans date (invalides) restent chargées pour être signalées
+            where, params = self._query_where(date_min=date_min)
+            where += f" OR (type IN {SPAN_TYPES} AND date_fin = '') OR (type NOT IN {SPAN_TYPES} AND date_evenement = '')"
+            records = self._select(where, params, with_id=True)
+        else:
+            records = self._select("WHERE id >= ?", (cursor,), with_id=True)
+        new_cursor = records[-1]["id"] if records else cursor
+        for record in records:
+            del record["id"]
+        return records, new_cursor
+
+    def append_many(self, annonces):
+        rows = [[str(value) for value in annonce_to_row(annonce)] for annonce in annonces]
+        placeholders = ", ".join("?" for _ in COLUMN_HEADERS)
+        with self._lock, self._conn:
+            self._conn.executemany(
+                f"INSERT INTO annonces ({', '.join(COLUMN_HEADERS)}) VALUES ({placeholders})", rows)
+
+    def query(self, date_min=None, date_max=None, paroisse=None):
+        return self._select(*self._query_where(date_min, date_max, paroisse))
+
+    def _query_where(self, date_min=None, date_max=None, paroisse=None):
+        # Deux branches par type pour que SQLite utilise les index date_fin / date_evenement
+        periode = [f"type IN {SPAN_TYPES}"]
+        ponctuel = [f"type NOT IN {SPAN_TYPES}"]
+        params_periode, params_ponctuel = [], []
+        if date_min is not None:
+            periode.append("date_fin >= ?")
+            ponctuel.append("date_evenement >= ?")
+            params_periode.append(date_min)
+            params_ponctuel.append(date_min)
+        if date_max is not None:
+            periode.append("date_debut != '' AND date_debut <= ?")
+            ponctuel.append("date_evenement != '' AND date_evenement <= ?")
+            params_periode.append(date_max)
+            params_ponctuel.append(date_max)
+
+        where = f"WHERE (({' AND '.join(periode)}) OR ({' AND '.join(ponctuel)}))"
+        params = params_periode + params_ponctuel
+        if paroisse is not None:
+            where += " AND paroisse = ?"
+            params.append(paroisse)
+        return where, params
+
+    def archive(self, before, batch_size=500):
+        expired = f"(type IN {SPAN_TYPES} AND date_fin < ?) OR (type NOT IN {SPAN_TYPES} AND date_evenement < ?)"
+        columns = ", ".join(COLUMN_HEADERS)
+        moved = 0
+        while True:
+            # Une transaction courte par lot pour ne pas bloquer les ajouts concurrents
+            with self._lock, self._conn:
+                ids = [row["id"] for row in self._conn.execute(
+                    f"SELECT id FROM annonces WHERE {expired} ORDER BY id LIMIT ?", (before, before, batch_size))]
+                if not ids:
+                    return moved
+                placeholders = ", ".join("?" for _ in ids)
+                self._conn.execute(
+                    f"INSERT INTO annonces_archive ({columns}) SELECT {columns} FROM annonces "
+                    f"WHERE id IN ({placeholders}) ORDER BY id", ids)
+                self._conn.execute(f"DELETE FROM annonces WHERE id IN ({placeholders})", ids)
+            moved += len(ids)
+
+
+class AnnonceCache:
+    """
+    Cache des annonces partagé par toutes les sessions du processus.
+    Alimenté par lecture incrémentale (seules les lignes ajoutées sont relues) et mis à jour
+    directement lors des ajouts (write-through).
+    """
+
+    def __init__(self, refresh_interval=60):
+        self.index = ExpiryIndex()
+        self.search_index = SearchIndex()
+        self.cursor = 0
+        self.refresh_interval = refresh_interval
+        self.refreshed_at = None
+        self._anchor = None
+        # Annonces ajoutées par ce processus, pas encore relues depuis le stockage
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        # Incrémentée à chaque changement du contenu : clé de mémorisation des vues calculées
+        self.version = 0
+        # Chargement en arrière-plan : `loaded` est levé après la première tentative
+        self.loaded = threading.Event()
+        self.last_error = None
+        self._loader = None
+        self._loader_lock = threading.Lock()
+
+    def mark_stale(self):
+        """Force une synchronisation au prochain load_annonces()."""
+        self.refreshed_at = None
+
+    def is_stale(self):
+        """Vrai si la dernière synchronisation date de plus de refresh_interval secondes."""
+        return self.refreshed_at is None or time.monotonic() - self.refreshed_at >= self.refresh_interval
+
+    def refresh(self, store, full=False, date_min=None):
+        """
+        Fusionne les annonces ajoutées depuis la dernière synchronisation. Retourne leur nombre.
+        date_min : les rechargements complets ignorent les annonces terminées avant (si le stockage le permet).
+        La lecture se fait hors du verrou du cache : les autres sessions lisent le cache pendant ce temps.
+        """
+        # Une seule synchronisation à la fois : curseur et ancre ne changent que sous ce verrou
+        with self._refresh_lock:
+            cursor = 0 if full else self.cursor
+
+            fetched, new_cursor = store.load_since(cursor, date_min)
+            if cursor:
+                if not fetched or _anchor_key(fetched[0]) != self._anchor:
+                    # Lignes supprimées ou déplacées (archivage...) : le curseur n'est plus fiable
+                    cursor = 0
+                    fetched, new_cursor = store.load_since(0, date_min)
+                else:
+                    fetched = fetched[1:]
+
+            # Dates analysées une fois pour toutes à l'ingestion
+            new_records = [a if isinstance(a, Annonce) else Annonce(a) for a in fetched]
+            if cursor == 0:
+                index, search_index = ExpiryIndex(new_records), SearchIndex(new_records)
+
+            with self._lock:
+                if cursor == 0:
+                    # Les ajouts pas encore relus (en file d'écriture, ou écrits après la lecture)
+                    # restent en cache et en attente : sinon ils disparaissent, doublons compris
+                    for annonce in new_records:
+                        self._take_pending(annonce)
+                    self._pending = {key: pending for key, pending in self._pending.items() if pending}
+                    kept = [annonce for pending in self._pending.values() for annonce in pending]
+                    index.extend(kept)
+                    search_index.extend(kept)
+                    self.index, self.search_index = index, search_index
+                else:
+                    # Nos propres ajouts sont déjà en cache : on ne les duplique pas
+                    new_records = [a for a in new_records if not self._take_pending(a)]
+                    self.index.extend(new_records)
+                    self.search_index.extend(new_records)
+                if new_records or cursor == 0:
+                    self.version += 1
+                if fetched:
+                    # Copie des seules colonnes projetées : la description chargée plus tard dans le
+                    # même objet ne doit pas faire croire à une ligne déplacée
+                    self._anchor = _anchor_key(fetched[-1])
+                self.cursor = new_cursor
+                self.refreshed_at = time.monotonic()
+                self.last_error = None
+            self.loaded.set()
+            return len(new_records)
+
+    def refresh_in_background(self, store_factory, sync, executor=None, context=None):
+        """
+        Lance sync(store) dans un thread (un seul à la fois) sans bloquer l'appelant.
+        store_factory() fournit le stockage ; une erreur est conservée dans last_error.
+        executor : pool de threads partagé (plusieurs sources chargées en parallèle), sinon un thread dédié.
+        context() : gestionnaire de contexte englobant tout le chargement dans le thread (mesures...).
+        """
+        with self._loader_lock:
+            if self._loader_running():
+                return self._loader
+            if executor is not None:
+                self._loader = executor.submit(self._background_refresh, store_factory, sync, context)
+                return self._loader
+            self._loader = threading.Thread(
+                target=self._background_refresh, args=(store_factory, sync, context), name="annonce-loader",
+                daemon=True)
+            self._loader.start()
+            return self._loader
+
+    def is_refreshing(self):
+        """Vrai si une synchronisation en arrière-plan est en cours."""
+        return self._loader_running()
+
+    def _loader_running(self):
+        loader = self._loader
+        if loader is None:
+            return False
+        return not loader.done() if isinstance(loader, Future) else loader.is_alive()
+
+    def _background_refresh(self, store_factory, sync, context=None):
+        with context() if context is not None else nullcontext():
+            try:
+                store = store_factory()
+                if store is None:
+                    raise ConnectionError("Stockage indisponible")
+                sync(store)
+                self.last_error = None
+            except Exception as e:
+                self.last_error = e
+            finally:
+                self.loaded.set()
+
+    def wait_background_refresh(self, timeout=None):
+        """Attend la fin de la synchronisation en arrière-plan éventuellement en cours."""
+        loader = self._loader
+        if isinstance(loader, Future):
+            wait([loader], timeout)
+        elif loader is not None:
+            loader.join(timeout)
+
+    def add(self, annonce):
+        """Ajoute immédiatement une annonce au cache partagé (visible par toutes les sessions)."""
+        annonce = Annonce(annonce)
+        with self._lock:
+            self.index.add(annonce)
+            self.search_index.add(annonce)
+            self._pending.setdefault(_pending_key(annonce), []).append(annonce)
+            self.version += 1
+
+    def add_unique(self, annonce):
+        """
+        Ajoute l'annonce sauf si un doublon (même paroisse, titre, date et heure) est déjà en cache.
+        Vérification et ajout sous le même verrou : deux envois simultanés ne passent pas tous les deux.
+        Retourne l'annonce existante en cas de doublon, sinon None.
+        """
+        annonce = Annonce(annonce)
+        with self._lock:
+            duplicate = self.search_index.find_duplicate(annonce)
+            if duplicate is not None:
+                return duplicate
+            self.index.add(annonce)
+            self.search_index.add(annonce)
+            self._pending.setdefault(_pending_key(annonce), []).append(annonce)
+            self.version += 1
+            return None
+
+    def find_duplicates(self, annonces):
+        """Sépare un lot en (annonces nouvelles, doublons) par rapport au cache et à l'intérieur du lot."""
+        new, duplicates, seen = [], [], set()
+        with self._lock:
+            for annonce in annonces:
+                parsed = Annonce(annonce)
+                key = duplicate_key(parsed)
+                if key in seen or self.search_index.find_duplicate(parsed) is not None:
+                    duplicates.append(annonce)
+                else:
+                    seen.add(key)
+                    new.append(annonce)
+        return new, duplicates
+
+    def add_many(self, annonces):
+        """Ajoute un lot d'annonces au cache partagé (import groupé) en une seule prise du verrou."""
+        annonces = [Annonce(annonce) for annonce in annonces]
+        with self._lock:
+            self.index.extend(annonces)
+            self.search_index.extend(annonces)
+            for annonce in annonces:
+                self._pending.setdefault(_pending_key(annonce), []).append(annonce)
+            self.version += 1
+
+    def _take_pending(self, annonce):
+        pending = self._pending.get(_pending_key(annonce))
+        if not pending:
+            return False
+        pending.pop(0)
+        return True
+
+    @property
+    def records(self):
+        """Annonces en cache, triées par date de début."""
+        with self._lock:
+            return self.index.active()
+
+    def pop_expired(self, today_iso, now_time):
+        """Retire du cache et retourne les annonces expirées à la date et à l'heure ("HH:MM") données."""
+        with self._lock:
+            expired = self.index.pop_expired((today_iso, now_time))
+            if expired:
+                self.search_index.remove(expired)
+                self.version += 1
+            return expired
+
+    def paroisses(self):
+        """Paroisses des annonces en cache (liste triée)."""
+        with self._lock:
+            return self.search_index.paroisses()
+
+    def search(self, text="", paroisse=None, annonce_type=None, date_min=None, date_max=None):
+        """Annonces en cache correspondant aux filtres, triées par date de début (voir SearchIndex.search)."""
+        with self._lock:
+            if date_min is not None or date_max is not None:
+                candidates = self.index.overlapping(date_min, date_max)
+                return self.search_index.search(text, paroisse, annonce_type, candidates=candidates)
+            return self.search_index.search(text, paroisse, annonce_type, ordered=self.index.active())
+
+    def load_search_details(self, store):
+        """
+        Complète les descriptions non chargées (lecture projetée) pour la recherche plein texte,
+        puis les réindexe. Retourne False si la feuille a changé entre-temps.
+        """
+        with self._lock:
+            missing = self.search_index.missing_details()
+        if not missing:
+            return True
+        # Lecture réseau hors verrou : les autres sessions ne l'attendent pas
+        consistent = store.load_all_details(missing)
+        with self._lock:
+            self.search_index.update(missing)
+            self.version += 1
+        return consistent
+
+    def discard_before(self, date_min):
+        """Oublie les annonces terminées avant date_min (le curseur et l'ancre sont conservés)."""
+        return len(self.pop_expired(date_min, ""))
+
+
+def _anchor_key(record):
+    """Valeurs des colonnes projetées d'une ligne lue, pour reconnaître la dernière ligne déjà lue."""
+    return tuple(record.get(header) for header in PROJECTED_COLUMNS)
+
+
+def _pending_key(annonce):
+    """
+    Clé de rapprochement d'un ajout local avec sa ligne relue : type et clé de doublon (paroisse, titre,
+    date, heure normalisées), tous présents dans la lecture projetée. Sans la date ni l'heure, une
+    autre "Messe" ajoutée ailleurs entre-temps serait prise pour la nôtre.
+    """
+    return (annonce.get('type', 'ponctuel'),) + duplicate_key(annonce)
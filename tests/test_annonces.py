@@ -0,0 +1,24 @@
+"""Statuts des rappels et rendu des cartes."""
+from datetime import date
+
+from annonces import Annonce, reminder_card_markdown, status_table
+
+TODAY = date.today().isoformat()
+
+
+def test_status_table_without_annonces():
+    reminders = status_table([])
+    assert reminders.empty
+    assert {"status", "status_text", "caption"} <= set(reminders.columns)
+
+
+def test_card_does_not_render_raw_hour_or_error():
+    annonces = [
+        Annonce({"type": "ponctuel", "paroisse": "P", "evenement_titre": "T", "date_evenement": TODAY,
+                 "heure_evenement": "<b>x</b>]"}),
+        Annonce({"type": "recurrent", "paroisse": "P", "evenement_titre": "T", "date_debut": TODAY,
+                 "date_fin": TODAY, "heure_evenement": "10:00", "recurrence": "FREQ=<i>]"}),
+    ]
+    cards = [reminder_card_markdown(row) for row in status_table(annonces).itertuples(index=False)]
+    assert "<b>" not in cards[0] and "<i>" not in cards[1]
+    assert "Non spécifiée" in cards[0]
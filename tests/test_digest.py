@@ -0,0 +1,14 @@
+"""Résumés hors navigateur sur des sources simulées."""
+from datetime import date, timedelta
+
+from bench import make_worksheet
+from digest import run
+from storage import SheetStore
+
+
+def test_sources_without_reminders(tmp_path):
+    far = {"type": "ponctuel", "paroisse": "P", "evenement_titre": "Loin", "evenement_description": "d",
+           "date_evenement": (date.today() + timedelta(days=60)).isoformat(), "heure_evenement": "10:00"}
+    sources = [("vide", lambda: SheetStore(make_worksheet([]))),
+               ("hors fenêtre", lambda: SheetStore(make_worksheet([far])))]
+    assert run(sources, str(tmp_path), days=7) == {"vide": 0, "hors fenêtre": 0}
@@ -0,0 +1,133 @@
+"""Synchronisation du cache sur une feuille simulée (bench.FakeWorksheet / FakeApi)."""
+import threading
+import time
+from datetime import date, timedelta
+
+from bench import FakeApi, generate_annonces, make_worksheet
+from storage import AnnonceCache, SheetStore
+
+TODAY = date.today()
+
+
+def ponctuel(titre, days, heure="10:00", paroisse="P"):
+    return {"type": "ponctuel", "paroisse": paroisse, "evenement_titre": titre, "evenement_description": "d",
+            "date_evenement": (TODAY + timedelta(days=days)).isoformat(), "heure_evenement": heure}
+
+
+def titres(cache):
+    return sorted(a.get("evenement_titre") for a in cache.records)
+
+
+# --- Curseur et ancre ---
+
+def test_incremental_refresh_reads_only_new_rows():
+    store = SheetStore(make_worksheet([ponctuel("a", 5)]))
+    cache = AnnonceCache()
+    cache.refresh(store)
+    store.append(ponctuel("b", 6))
+    assert cache.refresh(store) == 1
+    assert titres(cache) == ["a", "b"]
+    assert cache.refresh(store) == 0
+
+
+def test_loaded_descriptions_do_not_move_the_anchor():
+    api = FakeApi()
+    store = SheetStore(make_worksheet(generate_annonces(200), api=api))
+    cache = AnnonceCache()
+    cache.refresh(store)
+    store.load_details(sorted(cache.index.active(), key=lambda a: a.row)[-25:])
+
+    version, calls = cache.version, api.calls
+    assert cache.refresh(store) == 0
+    assert api.calls - calls == 1
+    assert cache.version == version
+
+
+def test_moved_rows_trigger_a_full_reload():
+    worksheet = make_worksheet([ponctuel("a", 5), ponctuel("b", 6)])
+    store = SheetStore(worksheet)
+    cache = AnnonceCache()
+    cache.refresh(store)
+    # Une autre instance supprime la dernière ligne lue et en ajoute une autre
+    del worksheet.values[2]
+    store.append(ponctuel("c", 7))
+    cache.refresh(store)
+    assert titres(cache) == ["a", "c"]
+
+
+def test_refresh_does_not_block_readers():
+    api = FakeApi(latency=0.3)
+    store = SheetStore(make_worksheet(generate_annonces(50), api=api))
+    cache = AnnonceCache()
+    cache.refresh(store)
+    refresh = threading.Thread(target=cache.refresh, args=(store,), kwargs={"full": True})
+    refresh.start()
+    time.sleep(0.05)
+    start = time.monotonic()
+    cache.records
+    cache.paroisses()
+    assert time.monotonic() - start < 0.1
+    refresh.join()
+
+
+# --- Ajouts locaux en attente ---
+
+def test_pending_addition_matches_its_own_row_only():
+    store = SheetStore(make_worksheet([ponctuel("seed", 50)]))
+    cache = AnnonceCache()
+    cache.refresh(store)
+    ours = ponctuel("Messe", 5)
+    cache.add(ours)
+    # Même titre, autre date, ajoutée par un autre processus : ce n'est pas la nôtre
+    store.append(ponctuel("Messe", 9))
+    cache.refresh(store)
+    # Notre ligne relue, heure reformatée par la feuille
+    store.append(dict(ours, heure_evenement="10:00:00"))
+    cache.refresh(store)
+    dates = sorted(a.date_evenement for a in cache.records if a.get("evenement_titre") == "Messe")
+    assert dates == [(TODAY + timedelta(days=5)).isoformat(), (TODAY + timedelta(days=9)).isoformat()]
+
+
+def test_unwritten_addition_survives_full_reload():
+    store = SheetStore(make_worksheet([ponctuel("seed", 50)]))
+    cache = AnnonceCache()
+    cache.refresh(store)
+    veillee = ponctuel("Veillée", 5, "20:00")
+    assert cache.add_unique(veillee) is None
+
+    # Encore dans la file d'écriture : un rechargement complet ne la relit pas
+    cache.refresh(store, full=True)
+    assert "Veillée" in titres(cache)
+    assert cache.add_unique(veillee) is not None
+
+    # Écrite entre-temps : relue une seule fois, plus en attente
+    store.append(veillee)
+    cache.refresh(store, full=True)
+    assert titres(cache).count("Veillée") == 1
+    assert not cache._pending
+
+
+def test_unwritten_addition_survives_archive():
+    store = SheetStore(make_worksheet([ponctuel("old", -5), ponctuel("new", 5)]))
+    cache = AnnonceCache()
+    cache.refresh(store)
+    veillee = ponctuel("Veillée", 5, "20:00")
+    cache.add_unique(veillee)
+
+    store.archive(TODAY.isoformat())
+    cache.refresh(store)
+    assert titres(cache) == ["Veillée", "new"]
+    assert cache.add_unique(veillee) is not None
+
+
+# --- Archivage ---
+
+def test_archive_keeps_row_order_across_batches():
+    rows = [ponctuel(f"{'old' if i % 3 else 'new'}{i}", -5 if i % 3 else 5) for i in range(20)]
+    worksheet = make_worksheet(rows)
+    store = SheetStore(worksheet)
+
+    assert store.archive(TODAY.isoformat(), batch_size=3) == 13
+    archive = worksheet.spreadsheet.worksheet("archive")
+    assert [row[2] for row in archive.values[-13:]] == [f"old{i}" for i in range(20) if i % 3]
+    assert [row[2] for row in worksheet.values[1:]] == [f"new{i}" for i in range(20) if not i % 3]
@@ -0,0 +1,38 @@
+"""File d'écriture : annonces refusées par l'API."""
+import json
+
+from bench import FakeAPIError
+from writer import AnnonceWriter
+
+
+class RejectingStore:
+    def __init__(self):
+        self.rows = []
+
+    def append_many(self, annonces):
+        if any(annonce.get("bad") for annonce in annonces):
+            raise FakeAPIError(400, "Invalid value")
+        self.rows.extend(annonces)
+
+
+def test_rejected_row_does_not_block_the_queue(tmp_path):
+    journal_path = str(tmp_path / "journal.jsonl")
+    store = RejectingStore()
+    writer = AnnonceWriter(lambda: store, journal_path, batch_size=10, min_interval=0.01)
+    for n in range(5):
+        writer.submit({"n": n, "bad": n == 2})
+    writer.start()
+    try:
+        assert writer.flush(timeout=5)
+    finally:
+        writer.stop(timeout=1)
+
+    assert [row["n"] for row in store.rows] == [0, 1, 3, 4]
+    assert [annonce["n"] for _, annonce, _ in writer.rejected] == [2]
+
+    # Conservée dans le journal et toujours écartée au redémarrage
+    replayed = AnnonceWriter(lambda: store, journal_path)
+    replayed._replay_journal()
+    assert replayed.pending_count() == 0 and replayed.rejected_count() == 1
+    with open(journal_path, encoding="utf-8") as journal:
+        assert {"dead": 2, "error": "Invalid value"} in [json.loads(line) for line in journal]
@@ -0,0 +1,224 @@
+"""File d'écriture des annonces : journal local durable et ajouts groupés en arrière-plan."""
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def is_rate_limited(exc):
+    """Vrai si l'exception correspond à un dépassement de quota de l'API Google (HTTP 429)."""
+    response = getattr(exc, "response", None)
+    return getattr(exc, "code", None) == 429 or getattr(response, "status_code", None) == 429
+
+
+def is_rejected(exc):
+    """
+    Vrai si l'API a refusé la requête elle-même (HTTP 4xx hors 408 et 429) : la renvoyer à
+    l'identique échouera toujours.
+    """
+    response = getattr(exc, "response", None)
+    status = getattr(response, "status_code", None) or getattr(exc, "code", None)
+    return isinstance(status, int) and 400 <= status < 500 and status not in (408, 429)
+
+
+class AnnonceWriter:
+    """
+    Journalise chaque annonce dans un fichier local (append-only) puis l'écrit en arrière-plan,
+    en regroupant les annonces en attente dans un seul append_many.
+    Les annonces non confirmées sont rejouées au redémarrage. Une annonce refusée par l'API est
+    écartée de la file (entrée "dead" du journal) pour ne pas bloquer les suivantes.
+    """
+
+    def __init__(self, store_factory, journal_path, batch_size=50, min_interval=1.0,
+                 max_backoff=300.0):
+        self.store_factory = store_factory
+        self.journal_path = journal_path
+        self.batch_size = batch_size
+        # Délai minimal entre deux écritures : laisse les annonces s'accumuler et ménage le quota
+        self.min_interval = min_interval
+        self.max_backoff = max_backoff
+        self.last_error = None
+        # Annonces refusées : (id, annonce, message d'erreur), conservées dans le journal
+        self.rejected = []
+
+        self._pending = []
+        self._next_id = 0
+        self._store = None
+        self._cond = threading.Condition()
+        self._journal_lock = threading.Lock()
+        self._thread = None
+        self._stopping = False
+
+    # --- Journal ---
+
+    def _journal_write(self, entries):
+        with self._journal_lock, open(self.journal_path, "a", encoding="utf-8") as journal:
+            for entry in entries:
+                journal.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            journal.flush()
+            os.fsync(journal.fileno())
+
+    def _replay_journal(self):
+        """Recharge les annonces journalisées mais jamais confirmées (arrêt pendant une écriture...)."""
+        if not os.path.exists(self.journal_path):
+            return
+        entries, acked, dead = {}, set(), {}
+        with open(self.journal_path, encoding="utf-8") as journal:
+            for line in journal:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Dernière ligne tronquée par un arrêt brutal
+                    continue
+                if "ack" in entry:
+                    acked.update(entry["ack"])
+                elif "dead" in entry:
+                    dead[entry["dead"]] = entry.get("error", "")
+                else:
+                    entries[entry["id"]] = entry["annonce"]
+
+        self._pending = [(entry_id, annonce) for entry_id, annonce in sorted(entries.items())
+                         if entry_id not in acked and entry_id not in dead]
+        self.rejected = [(entry_id, entries[entry_id], error) for entry_id, error in dead.items() if entry_id in entries]
+        self._next_id = max(entries, default=-1) + 1
+        self._compact_journal()
+
+    def _compact_journal(self):
+        """Réécrit le journal avec les seules annonces en attente ou refusées."""
+        with self._journal_lock:
+            tmp_path = self.journal_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as journal:
+                for entry_id, annonce in self._pending:
+                    journal.write(json.dumps({"id": entry_id, "annonce": annonce}, ensure_ascii=False) + "\n")
+                for entry_id, annonce, error in self.rejected:
+                    journal.write(json.dumps({"id": entry_id, "annonce": annonce}, ensure_ascii=False) + "\n")
+                    journal.write(json.dumps({"dead": entry_id, "error": error}, ensure_ascii=False) + "\n")
+                journal.flush()
+                os.fsync(journal.fileno())
+            os.replace(tmp_path, self.journal_path)
+
+    # --- API publique ---
+
+    def start(self):
+        """Rejoue le journal puis démarre le thread d'écriture."""
+        with self._cond:
+            if self._thread:
+                return self
+            self._replay_journal()
+            self._thread = threading.Thread(target=self._run, name="annonce-writer", daemon=True)
+            self._thread.start()
+        return self
+
+    def submit(self, annonce):
+        """Journalise l'annonce et rend la main immédiatement ; l'écriture distante est différée."""
+        with self._cond:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._journal_write([{"id": entry_id, "annonce": annonce}])
+            self._pending.append((entry_id, annonce))
+            self._cond.notify()
+        return entry_id
+
+    def pending_count(self):
+        """Nombre d'annonces journalisées pas encore écrites dans le stockage."""
+        with self._cond:
+            return len(self._pending)
+
+    def rejected_count(self):
+        """Nombre d'annonces refusées par le stockage, conservées dans le journal."""
+        with self._cond:
+            return len(self.rejected)
+
+    def flush(self, timeout=None):
+        """Attend que toutes les annonces en attente soient écrites. Retourne False si le délai expire."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._cond.notify()
+            while self._pending:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def stop(self, timeout=None):
+        """Arrête le thread d'écriture (les annonces non écrites restent dans le journal)."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout)
+
+    # --- Thread d'écriture ---
+
+    def _write_batch(self, batch):
+        if self._store is None:
+            self._store = self.store_factory()
+            if self._store is None:
+                raise ConnectionError("Stockage indisponible")
+        self._store.append_many([annonce for _, annonce in batch])
+
+    def _run(self):
+        backoff = self.min_interval
+        # Après un refus, les annonces du lot refusé sont écrites une par une pour isoler la fautive
+        isolating = 0
+        while True:
+            with self._cond:
+                while not self._pending and not self._stopping:
+                    self._cond.wait()
+                if self._stopping:
+                    return
+                batch = self._pending[:1 if isolating else self.batch_size]
+
+            try:
+                self._write_batch(batch)
+            except Exception as e:
+                self.last_error = e
+                if is_rejected(e):
+                    if len(batch) > 1:
+                        isolating = len(batch)
+                    else:
+                        self._reject(batch[0], e)
+                        isolating = max(isolating - 1, 0)
+                        self._sleep(self.min_interval)
+                    continue
+                if is_rate_limited(e):
+                    logger.warning("Quota Google Sheets atteint, nouvel essai dans %.0f s", backoff)
+                else:
+                    # Connexion à reprendre au prochain essai
+                    self._store = None
+                    logger.warning("Écriture des annonces impossible (%s), nouvel essai dans %.0f s", e, backoff)
+                self._sleep(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+                continue
+
+            self.last_error = None
+            backoff = self.min_interval
+            isolating = max(isolating - 1, 0)
+            written = {entry_id for entry_id, _ in batch}
+            self._journal_write([{"ack": sorted(written)}])
+            with self._cond:
+                self._pending = [item for item in self._pending if item[0] not in written]
+                if not self._pending:
+                    self._compact_journal()
+                self._cond.notify_all()
+            self._sleep(self.min_interval)
+
+    def _reject(self, item, error):
+        """Écarte de la file une annonce refusée ; elle reste dans le journal pour reprise manuelle."""
+        entry_id, annonce = item
+        logger.error("Annonce %s refusée par le stockage, écartée de la file d'écriture : %s", entry_id, error)
+        self._journal_write([{"dead": entry_id, "error": str(error)}])
+        with self._cond:
+            self._pending = [pending for pending in self._pending if pending[0] != entry_id]
+            self.rejected.append((entry_id, annonce, str(error)))
+            self._cond.notify_all()
+
+    def _sleep(self, seconds):
+        """Attente interruptible par stop()."""
+        with self._cond:
+            if not self._stopping:
+                self._cond.wait_for(lambda: self._stopping, timeout=seconds)